@@ -29,6 +29,7 @@ const uint32_t T_j[64] = {
     0x7a879d8a, 0x7a879d8a, 0x7a879d8a, 0x7a879d8a,
     0x7a879d8a, 0x7a879d8a, 0x7a879d8a, 0x7a879d8a,
     0x7a879d8a, 0x7a879d8a, 0x7a879d8a, 0x7a879d8a,
+    0x7a879d8a, 0x7a879d8a, 0x7a879d8a, 0x7a879d8a,
     0x7a879d8a, 0x7a879d8a, 0x7a879d8a, 0x7a879d8a
 };
 
@@ -125,6 +126,29 @@ void print_hash(__m256i V[8]) {
     }
 }
 
+// 供 Python (ctypes) 调用的接口：对 nblocks 个连续分组做串行压缩，state 为 8 个 32 位字。
+// 单条消息的分组之间有依赖，这里把同一分组广播到 8 个通道，只取通道 0 的结果。
+// 编译为共享库: g++ -O2 -mavx2 -shared -fPIC -DSM3_SIMD_LIB SM3_SIMD.cpp -o libsm3simd.so
+extern "C" void sm3_compress_blocks(uint32_t state[8], const uint8_t *data, size_t nblocks) {
+    __m256i V[8];
+    for (int i = 0; i < 8; i++) {
+        V[i] = _mm256_set1_epi32(state[i]);
+    }
+    uint8_t M[8][64];
+    for (size_t b = 0; b < nblocks; b++) {
+        for (int lane = 0; lane < 8; lane++) {
+            memcpy(M[lane], data + 64 * b, 64);
+        }
+        sm3_avx2_compress(V, M);
+    }
+    alignas(32) uint32_t out[8];
+    for (int i = 0; i < 8; i++) {
+        _mm256_store_si256((__m256i*)out, V[i]);
+        state[i] = out[0];
+    }
+}
+
+#ifndef SM3_SIMD_LIB
 int main() {
     uint8_t msg[8][64] = {0};
     const char* base = "abcdefgh";
@@ -144,3 +168,4 @@ int main() {
     print_hash(V);
     return 0;
 }
+#endif
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+from sm2lib import curve, field, sm3
+from sm2lib.curve import N, scalar_mult, scalar_mult_base, scalar_mult_double_and_add
+from sm2lib.key import SM2Key
+from sm2lib.sm3 import sm3_hash as get_hash
+from sm2lib.weierstrass import SECP256K1, SM2_CURVE, Curve
+
+# -- SM2 性能基准 --
+# 每项先预热若干次，再重复计时，输出分位数与 ops/sec；结果可写成 JSON，
+# 并与保存的基线比较，中位数变慢超过阈值时以非零状态码退出，可直接用作回归门禁。
+#
+#   python bench_sm2.py --json result.json
+#   python bench_sm2.py --save-baseline baseline.json
+#   python bench_sm2.py --baseline baseline.json --threshold 0.2
+#
+# 另外在新的解释器中测量冷启动 (import sm2lib.key，以及导入后生成密钥并签名一次)，
+# import 的中位数超过 --import-budget (默认 IMPORT_BUDGET_MS) 时同样以非零状态码退出。
+IMPORT_BUDGET_MS = 50
+_STARTUP_SNIPPETS = {
+    'startup_import': "import sm2lib.key",
+    'startup_first_sign': "from sm2lib.key import SM2Key; SM2Key().sign(b'x')",
+}
+
+def _percentile(sorted_samples: List[float], q: float) -> float:
+    index = min(len(sorted_samples) - 1, max(0, round(q / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int, nbytes: int = 0) -> Dict[str, float]:
+    """重复执行 fn，返回耗时统计 (秒)；nbytes 非零时额外给出吞吐量 MB/s"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, nbytes)
+
+def summarize(samples: List[float], nbytes: int = 0) -> Dict[str, float]:
+    samples = sorted(samples)
+    mean = sum(samples) / len(samples)
+    result = {
+        'runs': len(samples),
+        'mean': mean,
+        'min': samples[0],
+        'p50': _percentile(samples, 50),
+        'p90': _percentile(samples, 90),
+        'p99': _percentile(samples, 99),
+        'ops_per_sec': 1 / mean,
+    }
+    if nbytes: result['mb_per_sec'] = nbytes / mean / 1e6
+    return result
+
+def measure_startup(repeat: int) -> Dict[str, Dict[str, float]]:
+    """在新的解释器进程中计时各段启动代码 (不含解释器本身的启动)"""
+    results = {}
+    for name, snippet in _STARTUP_SNIPPETS.items():
+        code = f"import time; start = time.perf_counter(); {snippet}; print(time.perf_counter() - start)"
+        samples = []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+            samples.append(float(proc.stdout))
+        results[name] = summarize(samples)
+    return results
+
+def run_benchmarks(repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(2025)
+    key = SM2Key()
+    peer = SM2Key(public_key=key.public_key)
+    scalars = [rng.randrange(1, N) for _ in range(repeat + warmup)]
+
+    def cycling(fn):
+        it = iter(scalars * 2)
+        return lambda: fn(next(it))
+
+    results = measure_startup(max(3, repeat // 3))
+    curve.warm_up()  # 以下测量长期运行进程的稳态性能，后端切换和固定基表的构建不计入各项
+    slow_repeat = max(3, repeat // 5)  # 原始 double-and-add 较慢，减少次数
+    results['scalar_mult_double_and_add'] = measure(
+        cycling(lambda k: scalar_mult_double_and_add(k, key.public_key)), slow_repeat, 1)
+    for width in (3, 4, 5, 6, 7):
+        results[f'scalar_mult_w{width}'] = measure(
+            cycling(lambda k, w=width: scalar_mult(k, key.public_key, w)), repeat, warmup)
+    results['scalar_mult_base'] = measure(cycling(scalar_mult_base), repeat, warmup)
+    results['keygen'] = measure(SM2Key, repeat, warmup)
+
+    # 参数化引擎 (sm2lib.weierstrass) 在两条曲线上的对比，secp256k1 另测不用 GLV 的情况
+    secp_no_glv = Curve('secp256k1', SECP256K1.p, SECP256K1.a, SECP256K1.b, SECP256K1.n, *SECP256K1.G)
+    for name, engine in (('sm2', SM2_CURVE), ('secp256k1', SECP256K1), ('secp256k1_no_glv', secp_no_glv)):
+        point = engine.scalar_mult_base(rng.randrange(1, engine.n))
+        results[f'curve_{name}_scalar_mult'] = measure(cycling(lambda k, c=engine, q=point: c.scalar_mult(k, q)),
+                                                       repeat, warmup)
+
+    message = b'benchmark message'
+    signature = key.sign(message)
+    results['sign'] = measure(lambda: key.sign(message), repeat, warmup)
+    results['verify'] = measure(lambda: peer.verify(message, signature), repeat, warmup)
+
+    for size in (32, 1024, 16 * 1024):
+        plain = os.urandom(size)
+        cipher = peer.encrypt(plain)
+        results[f'encrypt_{size}B'] = measure(lambda: peer.encrypt(plain), repeat, warmup, size)
+        results[f'decrypt_{size}B'] = measure(lambda: key.decrypt(cipher), repeat, warmup, size)
+
+    for size in (64, 1024, 64 * 1024):
+        data = os.urandom(size)
+        results[f'get_hash_{size}B'] = measure(lambda: get_hash(data), repeat, warmup, size)
+    return results
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """返回中位数相对基线变慢超过 threshold 的条目说明"""
+    regressions = []
+    for name, base in baseline.items():
+        if name not in results: continue
+        ratio = results[name]['p50'] / base['p50']
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: p50 {base['p50'] * 1e3:.3f} ms -> {results[name]['p50'] * 1e3:.3f} ms (x{ratio:.2f})")
+    return regressions
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="SM2/SM3 性能基准")
+    parser.add_argument('--repeat', type=int, default=30, help="每项计时次数")
+    parser.add_argument('--warmup', type=int, default=3, help="每项预热次数")
+    parser.add_argument('--json', help="把结果写入 JSON 文件")
+    parser.add_argument('--save-baseline', help="把结果保存为基线")
+    parser.add_argument('--baseline', help="与该基线比较")
+    parser.add_argument('--threshold', type=float, default=0.2, help="允许的中位数变慢比例 (默认 0.2)")
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS, help="import sm2lib.key 的耗时上限 (毫秒)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, args.warmup)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sm3_backend': sm3.get_backend(),
+            'bigint_backend': field.BIGINT_BACKEND,
+        },
+        'results': results,
+    }
+
+    print(f"{'项目':<28}{'p50 (ms)':>12}{'p99 (ms)':>12}{'ops/s':>12}{'MB/s':>10}")
+    for name, r in results.items():
+        mb = f"{r['mb_per_sec']:.2f}" if 'mb_per_sec' in r else ''
+        print(f"{name:<30}{r['p50'] * 1e3:>12.3f}{r['p99'] * 1e3:>12.3f}{r['ops_per_sec']:>12.1f}{mb:>10}")
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    status = 0
+    import_ms = results['startup_import']['p50'] * 1e3
+    if import_ms > args.import_budget:
+        print(f"启动耗时超出预算: import sm2lib.key {import_ms:.1f} ms > {args.import_budget:.1f} ms")
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("性能回归:")
+            for line in regressions: print("  " + line)
+            return 1
+        print("与基线相比无性能回归")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
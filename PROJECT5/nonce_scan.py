@@ -0,0 +1,222 @@
+import argparse
+import base64
+import csv
+import dbm
+import io
+import json
+import sys
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from poc import recover_private_key
+from sm2lib.curve import N, decode_point, encode_point, scalar_mult_base
+from sm2lib.sign import DEFAULT_USER_ID, compute_z
+from sm2lib.sm3 import SM3
+
+# -- 批量扫描签名日志中的随机数 k 重用 --
+# 日志为 JSONL 或带表头的 CSV，每条记录包含字段:
+#   public_key  公钥的十六进制编码 (压缩 / 非压缩 / 64 字节 raw，见 decode_point)
+#   user_id     可省略，默认 DEFAULT_USER_ID
+#   message     消息，编码由 --message-encoding 指定 (hex / base64 / utf8)；若记录中已有摘要字段 e 则不需要
+#   r, s        签名，整数或十六进制字符串 (可带 0x 前缀)
+# 签名时 r = (e + x1) mod n，因此 x1 = (r - e) mod n 只由 k 决定: 以 x1 为键建立索引，一遍扫描即可
+# 发现所有 k 重用 (线性时间，而不是两两比较)。恢复私钥的索引以 (x1, 公钥) 为键，同一公钥的新签名与该键下
+# 已有的每条签名调用 poc.recover_private_key 恢复私钥，并用 d*G == 公钥 验证 (某条记录的 e 有误时仍能用其余记录恢复)；
+# 另有 x1 -> 最先出现的记录，某个公钥第一次在该 x1 上出现且与之不同时报告跨公钥重用 (仅凭这两条签名不能恢复)。
+# 每个 (公钥, user_id) 的 Z 只计算一次 (LRU 缓存)；解析与哈希在 worker 进程中并行，
+# 索引在主进程中按输入顺序维护，内存不足时可用 --index 指定磁盘上的 dbm 索引。
+#
+#   python nonce_scan.py signatures.jsonl
+#   python nonce_scan.py --format csv --workers 4 --index /tmp/x1.db logs.csv > findings.jsonl
+Prepared = Tuple[int, bytes, int, int, int, bytes]  # (行号, x1, e, r, s, 公钥编码)
+
+def parse_int(value: Union[int, str]) -> int:
+    """整数或十六进制字符串"""
+    if isinstance(value, int): return value
+    return int(value, 16)
+
+def _decode_message(value: str, encoding: str) -> bytes:
+    if encoding == 'hex': return bytes.fromhex(value)
+    if encoding == 'base64': return base64.b64decode(value, validate=True)
+    return value.encode('utf-8')
+
+@lru_cache(maxsize=65536)
+def _z_for(public_key: bytes, user_id: str) -> bytes:
+    return compute_z(decode_point(public_key), user_id)
+
+def iter_records(source: io.TextIOBase, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """逐条产生 (行号, 记录)；无法解析的行产生 (行号, None)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for lineno, line in enumerate(source, 1):
+        if not line.strip(): continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield lineno, record if isinstance(record, dict) else None
+
+def prepare_chunk(chunk: List[Tuple[int, Dict]], message_encoding: str = 'hex') -> List[Union[Prepared, int]]:
+    """计算一批记录的 e 与 x1；格式错误的记录只返回其行号"""
+    results = []
+    for lineno, record in chunk:
+        try:
+            public_key = encode_point(decode_point(bytes.fromhex(record['public_key'])), 'compressed')
+            r, s = parse_int(record['r']), parse_int(record['s'])
+            if not (1 <= r < N and 1 <= s < N): raise ValueError("Signature out of range.")
+            if record.get('e') not in (None, ''):
+                e = parse_int(record['e'])
+            else:
+                h = SM3(_z_for(public_key, record.get('user_id') or DEFAULT_USER_ID))
+                h.update(_decode_message(record['message'], message_encoding))
+                e = int.from_bytes(h.digest(), 'big')
+            x1 = (r - e) % N
+            results.append((lineno, x1.to_bytes(32, 'big'), e, r, s, public_key))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            results.append(lineno)
+    return results
+
+class NonceIndex:
+    """x1 -> 最先出现的签名记录，以及 (x1, 公钥) -> 该公钥在此 x1 上的全部签名；
+    path 为空时使用内存中的 dict，否则使用磁盘上的 dbm"""
+    RECORD_SIZE = 8 + 3 * 32 + 33  # 行号 | e | r | s | 压缩公钥
+
+    def __init__(self, path: str = None):
+        self._db = dbm.open(path, 'n') if path else {}
+
+    def close(self) -> None:
+        if not isinstance(self._db, dict): self._db.close()
+
+    def __enter__(self) -> 'NonceIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @staticmethod
+    def _pack(item: Prepared) -> bytes:
+        lineno, _, e, r, s, public_key = item
+        return lineno.to_bytes(8, 'big') + e.to_bytes(32, 'big') + r.to_bytes(32, 'big') + s.to_bytes(32, 'big') + public_key
+
+    @staticmethod
+    def _unpack(x1: bytes, data: bytes) -> Prepared:
+        ints = [int.from_bytes(data[i:j], 'big') for i, j in ((0, 8), (8, 40), (40, 72), (72, 104))]
+        return ints[0], x1, ints[1], ints[2], ints[3], bytes(data[104:])
+
+    def add(self, item: Prepared) -> Tuple[Union[Prepared, None], List[Prepared]]:
+        """记录 item，返回 (other, same):
+        other 为该 x1 上最先出现的记录，仅当它属于另一公钥且 item 是本公钥在此 x1 上的第一条签名时给出；
+        same 为本公钥在此 x1 上已有的签名 (重复记录的同一条签名不再保存)"""
+        x1, size = item[1], self.RECORD_SIZE
+        packed = self._pack(item)
+        bucket_key = b'k' + x1 + item[5]
+        bucket = self._db.get(bucket_key)
+        if bucket is not None:
+            records = [bucket[i:i + size] for i in range(0, len(bucket), size)]
+            if all(record[8:] != packed[8:] for record in records): self._db[bucket_key] = bytes(bucket) + packed
+            return None, [self._unpack(x1, record) for record in records]
+        self._db[bucket_key] = packed
+        first = self._db.get(b'x' + x1)
+        if first is None:
+            self._db[b'x' + x1] = packed
+            return None, []
+        return self._unpack(x1, first), []
+
+def check_collision(first: Prepared, second: Prepared) -> Union[Dict, None]:
+    """分析两条 x1 相同的签名，返回发现 (重复的同一条签名返回 None)"""
+    line1, x1, e1, r1, s1, pk1 = first
+    line2, _, e2, r2, s2, pk2 = second
+    finding = {'lines': [line1, line2], 'x1': x1.hex(), 'public_key': pk1.hex()}
+    if pk1 != pk2:
+        finding.update(type='cross_key_nonce_reuse', other_public_key=pk2.hex())
+        return finding
+    if (r1, s1) == (r2, s2): return None  # 同一条签名被重复记录
+    try:
+        d = recover_private_key((r1, s1), (r2, s2), e1.to_bytes(32, 'big'), e2.to_bytes(32, 'big'))
+    except (ValueError, ZeroDivisionError):
+        d = 0
+    if 1 <= d < N - 1 and encode_point(scalar_mult_base(d), 'compressed') == pk1:
+        finding.update(type='private_key_recovered', private_key=f"{d:064x}")
+    else:
+        finding['type'] = 'nonce_reuse_unverified'  # x1 偶然相同，或记录中的签名本身无效
+    return finding
+
+def _chunks(records: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+def _prepared_chunks(records: Iterable, workers: int, chunk_size: int, message_encoding: str) -> Iterator[List]:
+    """按输入顺序产生 prepare_chunk 的结果；workers > 1 时在进程池中计算，在途的块数有上限以限制内存"""
+    if workers <= 1:
+        for chunk in _chunks(records, chunk_size):
+            yield prepare_chunk(chunk, message_encoding)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in _chunks(records, chunk_size):
+            pending.append(pool.submit(prepare_chunk, chunk, message_encoding))
+            if len(pending) >= 4 * workers: yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def scan(records: Iterable[Tuple[int, Dict]], workers: int = 1, chunk_size: int = 2048, index_path: str = None,
+         message_encoding: str = 'hex', stats: Dict = None) -> Iterator[Dict]:
+    """扫描 (行号, 记录) 流，逐个产生发现；stats 非空时写入计数"""
+    stats = stats if stats is not None else {}
+    stats.update(records=0, malformed=0, collisions=0)
+    recovered = set()
+    with NonceIndex(index_path) as index:
+        for chunk in _prepared_chunks(records, workers, chunk_size, message_encoding):
+            for item in chunk:
+                stats['records'] += 1
+                if isinstance(item, int):
+                    stats['malformed'] += 1
+                    continue
+                other, same = index.add(item)
+                if other is not None:
+                    stats['collisions'] += 1
+                    yield check_collision(other, item)
+                for first in same:
+                    if item[5].hex() in recovered: break  # 同一私钥只报告一次
+                    stats['collisions'] += 1
+                    finding = check_collision(first, item)
+                    if finding is None: continue
+                    if finding['type'] == 'private_key_recovered': recovered.add(finding['public_key'])
+                    yield finding
+    stats['keys_recovered'] = len(recovered)
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="扫描 SM2 签名日志中的随机数重用并恢复私钥")
+    parser.add_argument('path', nargs='?', default='-', help="日志文件，- 表示标准输入")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    parser.add_argument('--message-encoding', choices=('hex', 'base64', 'utf8'), default='hex')
+    parser.add_argument('--workers', type=int, default=1, help="计算 e 与 x1 的进程数")
+    parser.add_argument('--chunk-size', type=int, default=2048, help="每个任务包含的记录数")
+    parser.add_argument('--index', help="磁盘索引 (dbm) 路径；省略时索引保存在内存中")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+    stats = {}
+    try:
+        for finding in scan(iter_records(source, args.format), args.workers, args.chunk_size, args.index,
+                            args.message_encoding, stats):
+            print(json.dumps(finding), flush=True)
+    finally:
+        if source is not sys.stdin: source.close()
+    print(f"记录 {stats['records']} 条，格式错误 {stats['malformed']} 条，x1 碰撞 {stats['collisions']} 次，"
+          f"恢复私钥 {stats['keys_recovered']} 个", file=sys.stderr)
+    return 1 if stats['keys_recovered'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,23 @@
 import hashlib
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives.asymmetric import utils
-from cryptography.hazmat.primitives import serialization
-from cryptography.exceptions import InvalidSignature
+import os
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple, Union
 
-def generate_satoshi_style_keypair() -> (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey):
+from sm2lib.sm3 import iter_chunks
+from sm2lib.weierstrass import SECP256K1, Point
+
+# cryptography (OpenSSL) 不可用时，验签改用 sm2lib.weierstrass 中带 GLV 加速的纯 Python secp256k1 实现
+try:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.asymmetric import utils
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.exceptions import InvalidSignature
+    HAVE_OPENSSL = True
+except ImportError:
+    HAVE_OPENSSL = False
+
+def generate_satoshi_style_keypair() -> "(ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)":
     # 使用 secp256k1 曲线生成私钥
     private_key = ec.generate_private_key(ec.SECP256K1())
     public_key = private_key.public_key()
@@ -17,7 +29,15 @@ def hash_message_for_signing(message: bytes) -> bytes:
     sha256_twice = hashlib.sha256(sha256_once).digest()
     return sha256_twice
 
-def sign_message(private_key: ec.EllipticCurvePrivateKey, message_hash: bytes) -> bytes:
+def hash_message_stream(source, chunk_size: int = 1 << 20) -> bytes:
+    """hash_message_for_signing 的流式版本: source 可为文件对象、字节块迭代器或 bytes/memoryview/mmap，
+    内存占用与消息大小无关"""
+    sha256_once = hashlib.sha256()
+    for chunk in iter_chunks(source, chunk_size):
+        sha256_once.update(chunk)
+    return hashlib.sha256(sha256_once.digest()).digest()
+
+def sign_message(private_key: "ec.EllipticCurvePrivateKey", message_hash: bytes) -> bytes:
 
     signature = private_key.sign(
         message_hash,
@@ -25,10 +45,44 @@ def sign_message(private_key: ec.EllipticCurvePrivateKey, message_hash: bytes) -
     )
     return signature
 
-def verify_signature(public_key: ec.EllipticCurvePublicKey, signature: bytes, message_hash: bytes) -> bool:
+def decode_der_signature(signature: bytes) -> Tuple[int, int]:
+    """解析 DER 编码的 ECDSA 签名 SEQUENCE { INTEGER r, INTEGER s }"""
+    def read_integer(offset: int) -> Tuple[int, int]:
+        if offset + 2 > len(signature) or signature[offset] != 0x02: raise ValueError("Invalid DER signature.")
+        end = offset + 2 + signature[offset + 1]
+        if end > len(signature) or end == offset + 2 or signature[offset + 2] & 0x80:
+            raise ValueError("Invalid DER signature.")
+        return int.from_bytes(signature[offset + 2:end], 'big'), end
+    if len(signature) < 8 or signature[0] != 0x30 or signature[1] != len(signature) - 2:
+        raise ValueError("Invalid DER signature.")
+    r, offset = read_integer(2)
+    s, offset = read_integer(offset)
+    if offset != len(signature): raise ValueError("Invalid DER signature.")
+    return r, s
+
+def public_key_point(public_key) -> Point:
+    """把 cryptography 公钥对象、SEC1 编码 (压缩 / 非压缩) 或 (x, y) 统一为 secp256k1 上的点"""
+    if HAVE_OPENSSL and isinstance(public_key, ec.EllipticCurvePublicKey):
+        numbers = public_key.public_numbers()
+        return numbers.x, numbers.y
+    if isinstance(public_key, (bytes, bytearray, memoryview)): return SECP256K1.decode_point(public_key)
+    if not SECP256K1.is_on_curve(tuple(public_key)): raise ValueError("Point is not on the curve.")
+    return tuple(public_key)
+
+def verify_signature_python(public_key: Union[Point, bytes], signature: bytes, message_hash: bytes) -> bool:
+    """纯 Python 验签 (secp256k1 + GLV)，不依赖 OpenSSL"""
+    try:
+        point, (r, s) = public_key_point(public_key), decode_der_signature(signature)
+    except ValueError:
+        return False
+    return SECP256K1.ecdsa_verify(point, int.from_bytes(message_hash, 'big'), (r, s))
+
+def verify_signature(public_key: "Union[ec.EllipticCurvePublicKey, Point, bytes]", signature: bytes, message_hash: bytes) -> bool:
     """
-    使用公钥验证签名是否有效。
+    使用公钥验证签名是否有效。公钥不是 cryptography 对象或 OpenSSL 不可用时走纯 Python 实现。
     """
+    if not (HAVE_OPENSSL and isinstance(public_key, ec.EllipticCurvePublicKey)):
+        return verify_signature_python(public_key, signature, message_hash)
     try:
         public_key.verify(
             signature,
@@ -39,6 +93,145 @@ def verify_signature(public_key: ec.EllipticCurvePublicKey, signature: bytes, me
     except InvalidSignature:
         return False
 
+
+# -- 公钥恢复 (Bitcoin 紧凑签名: 1 字节头 27 + recovery_id (+4 表示压缩公钥) || r || s) --
+def encode_compact_signature(r: int, s: int, recovery_id: int, compressed: bool = True) -> bytes:
+    return bytes([27 + recovery_id + (4 if compressed else 0)]) + r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+
+def decode_compact_signature(signature: bytes) -> Tuple[int, int, int, bool]:
+    """返回 (r, s, recovery_id, compressed)"""
+    if len(signature) != 65 or not 27 <= signature[0] < 35: raise ValueError("Invalid compact signature.")
+    header = signature[0] - 27
+    return int.from_bytes(signature[1:33], 'big'), int.from_bytes(signature[33:], 'big'), header & 3, header >= 4
+
+def sign_message_recoverable(private_key: "ec.EllipticCurvePrivateKey", message_hash: bytes) -> bytes:
+    """签名并返回 65 字节紧凑签名；OpenSSL 不返回 k，recovery_id 通过尝试恢复确定"""
+    r, s = decode_der_signature(sign_message(private_key, message_hash))
+    public_key = public_key_point(private_key.public_key())
+    recovery_id = SECP256K1.ecdsa_recovery_id(public_key, int.from_bytes(message_hash, 'big'), (r, s))
+    return encode_compact_signature(r, s, recovery_id)
+
+def recover_public_key(signature: bytes, message_hash: bytes) -> Point:
+    """由紧凑签名恢复公钥 (一次多标量乘法)，签名无效时抛出 ValueError"""
+    r, s, recovery_id, _ = decode_compact_signature(signature)
+    return SECP256K1.ecdsa_recover(int.from_bytes(message_hash, 'big'), (r, s), recovery_id)
+
+def _recover_chunk(chunk: List[Tuple[bytes, bytes]]) -> List[Point]:
+    results = []
+    for signature, message_hash in chunk:
+        try:
+            results.append(recover_public_key(signature, message_hash))
+        except ValueError:
+            results.append(None)
+    return results
+
+def recover_public_keys_batch(items: Iterable[Tuple[bytes, bytes]], max_workers: int = None,
+                              chunksize: int = 64) -> List[Point]:
+    """批量恢复公钥，items 中每项为 (紧凑签名, message_hash)；按块分发到进程池 (纯 Python 运算受 GIL 限制)，
+    返回与输入顺序一致的公钥列表，无效条目为 None"""
+    items = [(bytes(signature), bytes(message_hash)) for signature, message_hash in items]
+    if max_workers == 1 or len(items) <= chunksize: return _recover_chunk(items)
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return [point for chunk_result in pool.map(_recover_chunk, chunks) for point in chunk_result]
+
+class AccountIndex:
+    """公钥 -> 账户索引
+
+    收到只带 (r, s, recovery_id) 的签名时，先恢复出公钥 (一次多标量乘法)，再用一次 dict 查找确定账户，
+    不必用每个已知公钥逐一验签。默认用于 secp256k1 紧凑签名；SM2 使用 AccountIndex.sm2(...)，
+    此时 resolve 的参数为 SM2Key.sign_recoverable 返回的 (r, s, recovery_id, e) 与原始消息，恢复后会校验 e 与消息一致。
+    """
+    def __init__(self, accounts: Dict[Point, Hashable] = None, recover: Callable = recover_public_key,
+                 recover_batch: Callable = None):
+        self.recover = recover
+        self.recover_batch = recover_batch or (recover_public_keys_batch if recover is recover_public_key else None)
+        self._accounts = {}
+        for public_key, account in (accounts or {}).items():
+            self.add(public_key, account)
+
+    @classmethod
+    def sm2(cls, accounts: Dict[Point, Hashable] = None, user_id: str = None) -> 'AccountIndex':
+        """SM2 账户索引，所有签名者使用同一 user_id (默认 DEFAULT_USER_ID)"""
+        from sm2lib.sign import DEFAULT_USER_ID, recover_batch, recover_public_key as recover_sm2
+        user_id = user_id or DEFAULT_USER_ID
+        def recover(signature, message: bytes) -> Point:
+            return recover_sm2(message, signature, user_id)
+        def recover_many(items: List[Tuple], max_workers: int = None) -> List[Point]:
+            return recover_batch([(message, signature, user_id) for signature, message in items], max_workers)
+        return cls(accounts, recover, recover_many)
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def add(self, public_key: Point, account: Hashable) -> None:
+        self._accounts[tuple(public_key)] = account
+
+    def lookup(self, public_key: Point) -> Hashable:
+        return self._accounts.get(tuple(public_key)) if public_key is not None else None
+
+    def resolve(self, signature, message_hash) -> Hashable:
+        """返回签名者的账户，签名无效或公钥未登记时返回 None"""
+        try:
+            return self.lookup(self.recover(signature, message_hash))
+        except ValueError:
+            return None
+
+    def resolve_batch(self, items: Iterable[Tuple], max_workers: int = None) -> List[Hashable]:
+        """批量 resolve，items 中每项为 (signature, message_hash)"""
+        items = list(items)
+        if self.recover_batch is None: return [self.resolve(*item) for item in items]
+        return [self.lookup(public_key) for public_key in self.recover_batch(items, max_workers=max_workers)]
+
+@lru_cache(maxsize=65536)
+def load_public_key(data: bytes):
+    """反序列化 SEC1 编码的公钥并缓存: 有 OpenSSL 时返回 cryptography 公钥对象，否则返回曲线上的点"""
+    if HAVE_OPENSSL: return ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256K1(), data)
+    return SECP256K1.decode_point(data)
+
+def _verify_chunk(chunk: List[Tuple]) -> List[bool]:
+    return [verify_signature(public_key, signature, message_hash) for public_key, signature, message_hash in chunk]
+
+def verify_signatures_batch(items: Iterable[Tuple], max_workers: int = None, chunksize: int = 256) -> List[bool]:
+    """批量验签，返回与输入顺序一致的布尔列表
+
+    items 中每项为 (public_key, signature, message_hash)，public_key 可为 SEC1 字节、坐标或 cryptography 公钥对象。
+    字节公钥先去重，每个不同的公钥只反序列化一次 (并在多次调用之间缓存)，无法解析的公钥对应的条目判为失败；
+    之后按块分发到线程池，OpenSSL 验签时会释放 GIL，多个线程可真正并行。没有 OpenSSL 时纯 Python 验签受 GIL 限制，
+    改为在当前线程中顺序执行。
+    """
+    items = list(items)
+    results = [False] * len(items)
+    keys = {}
+    for public_key, _, _ in items:
+        if isinstance(public_key, (bytes, bytearray, memoryview)) and bytes(public_key) not in keys:
+            data = bytes(public_key)
+            try:
+                keys[data] = load_public_key(data)
+            except ValueError:
+                keys[data] = None
+    index, work = [], []
+    for i, (public_key, signature, message_hash) in enumerate(items):
+        if isinstance(public_key, (bytes, bytearray, memoryview)):
+            public_key = keys[bytes(public_key)]
+            if public_key is None: continue
+        index.append(i)
+        work.append((public_key, bytes(signature), bytes(message_hash)))
+    chunks = [work[i:i + chunksize] for i in range(0, len(work), chunksize)]
+    if not HAVE_OPENSSL or max_workers == 1 or len(chunks) <= 1:
+        chunk_results = map(_verify_chunk, chunks)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            chunk_results = list(pool.map(_verify_chunk, chunks))
+    position = 0
+    for chunk_result in chunk_results:
+        for ok in chunk_result:
+            results[index[position]] = ok
+            position += 1
+    return results
+
 if __name__ == '__main__':
     print("===模仿中本聪数字签名过程===")
 
@@ -73,6 +266,19 @@ if __name__ == '__main__':
         print("验证成功")
     else:
         print("验证失败")
+
+    public_key_bytes = bytes.fromhex(public_key_hex)
+    print(f"纯 Python (GLV) 验签: {verify_signature_python(public_key_bytes, signature, message_hash)}")
+    batch = [(public_key_bytes, signature, message_hash), (public_key_bytes, signature, hash_message_for_signing(b"x"))]
+    print(f"批量验签: {verify_signatures_batch(batch)}")
+
+    print("===公钥恢复===")
+    compact_signature = sign_message_recoverable(satoshi_imitation_private_key, message_hash)
+    recovered = SECP256K1.encode_point(recover_public_key(compact_signature, message_hash))
+    print(f"紧凑签名: {compact_signature.hex()}")
+    print(f"恢复的公钥: {recovered.hex()} {'一致' if recovered == public_key_bytes else '不一致'}")
+    index = AccountIndex({public_key_point(public_key_bytes): 'satoshi'})
+    print(f"账户: {index.resolve(compact_signature, message_hash)}")
         
     #篡改签名
     print("===篡改签名验证===")
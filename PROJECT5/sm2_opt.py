@@ -1,214 +1,16 @@
-import hashlib
-import random
-from typing import Tuple, Union, List
 import time
 
-# -- SM2 推荐曲线参数 (来自 GB/T 32918.2-2016) --
-P = 0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFF
-A = 0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFC
-B = 0x28E9FA9E_9D9F5E34_4D5A9E4B_CF6509A7_F39789F5_15AB8F92_DDBCBD41_4D940E93
-N = 0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_7203DF6B_21C6052B_53BBF409_39D54123
-Gx = 0x32C4AE2C_1F198119_5F990446_6A39C994_8FE30BBF_F2660BE1_715A4589_334C74C7
-Gy = 0xBC3736A2_F4F6779C_59BDCEE3_6B692153_D0A9877C_C62A4740_02DF32E5_2139F0A0
-
-Point = Tuple[int, int]  # 点定义为 (x, y)
-
-# -- SM3实现 (保持不变) --
-def _rotate_left(x: int, n: int) -> int:
-    return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
-def _ff(x: int, y: int, z: int, j: int) -> int:
-    return (x ^ y ^ z) if 0 <= j <= 15 else (x & y) | (x & z) | (y & z)
-def _gg(x: int, y: int, z: int, j: int) -> int:
-    return (x ^ y ^ z) if 0 <= j <= 15 else (x & y) | (~x & z)
-def _p0(x: int) -> int:
-    return x ^ _rotate_left(x, 9) ^ _rotate_left(x, 17)
-def _p1(x: int) -> int:
-    return x ^ _rotate_left(x, 15) ^ _rotate_left(x, 23)
-def get_hash(data: bytes) -> bytes:
-    iv = [0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
-          0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E]
-    length = len(data)
-    padded_data = data + b'\x80'
-    padded_data += b'\x00' * ((56 - (length + 1) % 64) % 64)
-    padded_data += (length * 8).to_bytes(8, 'big')
-    for i in range(0, len(padded_data), 64):
-        block = padded_data[i:i+64]
-        w = [int.from_bytes(block[j:j+4], 'big') for j in range(0, 64, 4)]
-        for j in range(16, 68):
-            term = w[j-16] ^ w[j-9] ^ _rotate_left(w[j-3], 15)
-            w.append(_p1(term) ^ _rotate_left(w[j-13], 7) ^ w[j-6])
-        w_prime = [(w[j] ^ w[j+4]) for j in range(64)]
-        a, b, c, d, e, f, g, h = iv
-        for j in range(64):
-            t_j = 0x79CC4519 if 0 <= j <= 15 else 0x7A879D8A
-            ss1 = _rotate_left((_rotate_left(a, 12) + e + _rotate_left(t_j, j % 32)) & 0xFFFFFFFF, 7)
-            ss2 = ss1 ^ _rotate_left(a, 12)
-            tt1 = (_ff(a, b, c, j) + d + ss2 + w_prime[j]) & 0xFFFFFFFF
-            tt2 = (_gg(e, f, g, j) + h + ss1 + w[j]) & 0xFFFFFFFF
-            d = c; c = _rotate_left(b, 9); b = a; a = tt1
-            h = g; g = _rotate_left(f, 19); f = e; e = _p0(tt2)
-        iv = [(iv[k] ^ [a,b,c,d,e,f,g,h][k]) & 0xFFFFFFFF for k in range(8)]
-    return b''.join(x.to_bytes(4, 'big') for x in iv)
-
-# -- 基础数学运算 (保持不变) --
-def inv(a: int, n: int) -> int:
-    if a == 0: raise ZeroDivisionError("inverse of 0 does not exist")
-    lm, hm, low, high = 1, 0, a % n, n
-    while low > 1:
-        r = high // low
-        nm, new = hm - lm * r, high - low * r
-        lm, low, hm, high = nm, new, lm, low
-    return lm % n
-
-# -- 椭圆曲线运算 (保持不变) --
-def is_on_curve(p: Point) -> bool:
-    if p is None: return True
-    x, y = p
-    return (y * y - (x * x * x + A * x + B)) % P == 0
-def point_neg(p: Point) -> Union[Point, None]:
-    if p is None: return None
-    return (p[0], -p[1] % P)
-def point_add(p1: Point, p2: Point) -> Union[Point, None]:
-    if p1 is None: return p2
-    if p2 is None: return p1
-    x1, y1 = p1; x2, y2 = p2
-    if x1 == x2 and y1 != y2: return None
-    if x1 == x2: m = (3 * x1 * x1 + A) * inv(2 * y1, P) % P
-    else: m = (y2 - y1) * inv(x2 - x1, P) % P
-    x3 = (m * m - x1 - x2) % P
-    y3 = (m * (x1 - x3) - y1) % P
-    return (x3, y3)
-
-# ==================== [ 性能优化改动区域 ] ====================
-
-def scalar_mult_double_and_add(k: int, p: Point) -> Union[Point, None]:
-    """标量乘法 - 原始的 Double-and-add 算法 (用于性能对比)"""
-    if p is None or k % N == 0: return None
-    result = None
-    addend = p
-    while k:
-        if k & 1: result = point_add(result, addend)
-        addend = point_add(addend, addend)
-        k >>= 1
-    return result
-
-def get_naf_w(k: int, width: int) -> List[int]:
-    """w-NAF 辅助函数：计算整数 k 的 w-NAF 表示"""
-    naf, power_of_2_width, half_power_of_2_width = [], 1 << width, 1 << (width - 1)
-    while k > 0:
-        if k & 1:
-            z = k % power_of_2_width
-            if z >= half_power_of_2_width: z -= power_of_2_width
-            naf.append(z)
-            k -= z
-        else: naf.append(0)
-        k >>= 1
-    return naf
-
-def scalar_mult(k: int, p: Point, width: int = 5) -> Union[Point, None]:
-    """标量乘法 - 优化后的 w-NAF 算法"""
-    if p is None or k % N == 0: return None
-    precomputed_points = {}
-    p2 = point_add(p, p)
-    current_p = p
-    for i in range(1, 1 << (width - 1)):
-        precomputed_points[2 * i - 1] = current_p
-        current_p = point_add(current_p, p2)
-    naf = get_naf_w(k, width)
-    result = None
-    for i in range(len(naf) - 1, -1, -1):
-        if result is not None: result = point_add(result, result)
-        d = naf[i]
-        if d != 0:
-            point_to_add = precomputed_points[d] if d > 0 else point_neg(precomputed_points[-d])
-            result = point_add(result, point_to_add) if result is not None else point_to_add
-    return result
-
-# =============================================================
-
-# SM2Key 类和其中的方法保持原样，它们会自动调用上面优化后的 scalar_mult 函数
-class SM2Key:
-    def __init__(self, private_key: int = None, public_key: Point = None):
-        self.G = (Gx, Gy)
-        if private_key:
-            self.private_key = private_key
-            self.public_key = scalar_mult(private_key, self.G)
-        elif public_key:
-            self.public_key = public_key
-            self.private_key = None
-        else:
-            self.private_key = random.randrange(1, N)
-            self.public_key = scalar_mult(self.private_key, self.G)
-
-    def _get_z(self, user_id: str) -> bytes:
-        user_id_bytes = user_id.encode('utf-8')
-        entl = (len(user_id_bytes) * 8).to_bytes(2, 'big')
-        data_to_hash = entl + user_id_bytes
-        data_to_hash += A.to_bytes(32, 'big') + B.to_bytes(32, 'big')
-        data_to_hash += Gx.to_bytes(32, 'big') + Gy.to_bytes(32, 'big')
-        data_to_hash += self.public_key[0].to_bytes(32, 'big')
-        data_to_hash += self.public_key[1].to_bytes(32, 'big')
-        return get_hash(data_to_hash)
-
-    def sign(self, message: bytes, user_id: str = "1234567812345678") -> Tuple[int, int]:
-        if not self.private_key: raise ValueError("Private key is not available for signing.")
-        z = self._get_z(user_id)
-        m_prime = z + message
-        e = int.from_bytes(get_hash(m_prime), 'big')
-        while True:
-            k = random.randrange(1, N) # k的生成方式保持原样
-            x1, y1 = scalar_mult(k, self.G)
-            r = (e + x1) % N
-            if r == 0 or r + k == N: continue
-            d = self.private_key
-            s = (inv(1 + d, N) * (k - r * d)) % N
-            if s != 0: break
-        return r, s
-
-    def verify(self, message: bytes, signature: Tuple[int, int], user_id: str = "1234567812345678") -> bool:
-        r, s = signature
-        if not (1 <= r < N and 1 <= s < N): return False
-        z = self._get_z(user_id)
-        m_prime = z + message
-        e = int.from_bytes(get_hash(m_prime), 'big')
-        t = (r + s) % N
-        if t == 0: return False
-        p1 = scalar_mult(s, self.G)
-        p2 = scalar_mult(t, self.public_key)
-        x, y = point_add(p1, p2)
-        R = (e + x) % N
-        return R == r
-
-    def encrypt(self, plain_bytes: bytes) -> bytes:
-        while True:
-            k = random.randrange(1, N) # k的生成方式保持原样
-            c1_point = scalar_mult(k, self.G)
-            x1, y1 = c1_point
-            c1 = x1.to_bytes(32, 'big') + y1.to_bytes(32, 'big')
-            x2, y2 = scalar_mult(k, self.public_key)
-            kdf_input = x2.to_bytes(32, 'big') + y2.to_bytes(32, 'big')
-            t = get_hash(kdf_input) # KDF方式保持原样
-            c2 = bytes(p_byte ^ t_byte for p_byte, t_byte in zip(plain_bytes, t))
-            c3_input = x2.to_bytes(32, 'big') + plain_bytes + y2.to_bytes(32, 'big')
-            c3 = get_hash(c3_input)
-            return c1 + c3 + c2
-
-    def decrypt(self, cipher_bytes: bytes) -> bytes:
-        if not self.private_key: raise ValueError("Private key is not available for decryption.")
-        c1_len, c3_len = 64, 32
-        c1, c3, c2 = cipher_bytes[:c1_len], cipher_bytes[c1_len:c1_len+c3_len], cipher_bytes[c1_len+c3_len:]
-        x1, y1 = int.from_bytes(c1[:32], 'big'), int.from_bytes(c1[32:], 'big')
-        c1_point = (x1, y1)
-        if not is_on_curve(c1_point): raise ValueError("C1 is not a valid point on the curve.")
-        x2, y2 = scalar_mult(self.private_key, c1_point)
-        kdf_input = x2.to_bytes(32, 'big') + y2.to_bytes(32, 'big')
-        t = get_hash(kdf_input)
-        m_prime = bytes(c_byte ^ t_byte for c_byte, t_byte in zip(c2, t))
-        c3_prime_input = x2.to_bytes(32, 'big') + m_prime + y2.to_bytes(32, 'big')
-        c3_prime = get_hash(c3_prime_input)
-        if c3_prime != c3: raise ValueError("Decryption failed. Hash check invalid.")
-        return m_prime
-
+# sm2_opt 的实现已拆分到 sm2lib 包中 (见 sm2lib/__init__.py)，本模块保留原有的导入路径和演示。
+from sm2lib.field import P, fp_batch_inv, fp_inv, fp_sqrt
+from sm2lib.curve import A, B, N, Gx, Gy, Point, JacobianPoint, inv, is_on_curve, point_neg, point_add, \
+    scalar_mult_double_and_add, get_naf_w, to_jacobian, from_jacobian, batch_from_jacobian, jacobian_neg, \
+    jacobian_double, jacobian_add, jacobian_add_affine, precompute_odd_multiples, multi_scalar_mult, scalar_mult, \
+    BASE_TABLE_WIDTH, build_base_table, save_base_table, load_base_table, get_base_table, base_odd_multiples, \
+    scalar_mult_base, POINT_FORMATS, encode_point, decode_point, use_bigint_backend, warm_up
+from sm2lib.sm3 import SM3, iter_chunks, sm3_hash as get_hash
+from sm2lib.sign import DEFAULT_USER_ID, compute_z, CacheInfo, PublicKeyCache, NoncePool, VerifyItem, verify_batch
+from sm2lib.encrypt import KDFStream, kdf, xor_bytes
+from sm2lib.key import SM2Key, generate_keypairs
 
 if __name__ == '__main__':
     # 生成密钥对
@@ -0,0 +1,40 @@
+"""SM2 / SM3 国密算法实现
+
+子模块:
+    field    SM2 素域运算与大整数后端 (Python int / gmpy2)
+    sm3      SM3 杂凑算法及可插拔的压缩函数后端
+    curve    曲线参数、点运算、标量乘法、G 的固定基表与点编码
+    sign     数字签名、公钥预计算缓存、签名随机数池、批量验签与公钥恢复
+    encrypt  公钥加密与 KDF
+    key      SM2Key 与批量密钥生成
+    weierstrass  参数化的短 Weierstrass 曲线引擎 (SM2、带 GLV 的 secp256k1)
+    server   微批处理的 asyncio 签名/加解密服务及其客户端
+    profiling  可选的热点计数与分阶段计时
+
+`import sm2lib` 本身不导入任何子模块，下面列出的名字在第一次访问时才加载对应子模块；
+gmpy2、NumPy、SM3 的 SIMD 共享库和 G 的固定基表也都在真正用到时才加载或构建，
+以降低命令行工具这类短命进程的启动开销。
+"""
+import importlib
+
+_EXPORTS = {
+    'P': 'field', 'set_bigint_backend': 'field',
+    'SM3': 'sm3', 'sm3_hash': 'sm3', 'set_backend': 'sm3', 'available_backends': 'sm3',
+    'A': 'curve', 'B': 'curve', 'N': 'curve', 'Gx': 'curve', 'Gy': 'curve', 'Point': 'curve',
+    'scalar_mult': 'curve', 'scalar_mult_base': 'curve', 'multi_scalar_mult': 'curve',
+    'encode_point': 'curve', 'decode_point': 'curve', 'warm_up': 'curve',
+    'DEFAULT_USER_ID': 'sign', 'compute_z': 'sign', 'PublicKeyCache': 'sign', 'NoncePool': 'sign',
+    'verify_batch': 'sign', 'recover_public_key': 'sign', 'recover_batch': 'sign',
+    'kdf': 'encrypt', 'KDFStream': 'encrypt',
+    'SM2Key': 'key', 'generate_keypairs': 'key',
+    'SM2Server': 'server', 'SM2Client': 'server',
+    'Profiler': 'profiling',
+    'Curve': 'weierstrass', 'SM2_CURVE': 'weierstrass', 'SECP256K1': 'weierstrass',
+}
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    if name not in _EXPORTS: raise AttributeError(f"module 'sm2lib' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
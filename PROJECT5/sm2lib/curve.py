@@ -0,0 +1,265 @@
+import hashlib
+import os
+from functools import lru_cache
+from typing import Tuple, Union, List
+
+from . import field
+from .field import P, fp_mul_add, fp_sqrt, mpz
+from .weierstrass import SM2_CURVE, Curve, JacobianPoint
+
+# -- SM2 推荐曲线参数 (来自 GB/T 32918.2-2016)，素数 P 与域运算见 field.py --
+A = 0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFC
+B = 0x28E9FA9E_9D9F5E34_4D5A9E4B_CF6509A7_F39789F5_15AB8F92_DDBCBD41_4D940E93
+N = 0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_7203DF6B_21C6052B_53BBF409_39D54123
+Gx = 0x32C4AE2C_1F198119_5F990446_6A39C994_8FE30BBF_F2660BE1_715A4589_334C74C7
+Gy = 0xBC3736A2_F4F6779C_59BDCEE3_6B692153_D0A9877C_C62A4740_02DF32E5_2139F0A0
+
+Point = Tuple[int, int]  # 点定义为 (x, y)
+SM2_CURVE.p = P  # SM2_BIGINT=gmpy2 时 field 在导入时即已切换到 mpz
+
+# -- 基础数学运算 --
+def inv(a: int, n: int) -> int:
+    """模 n 求逆，由 field 的大整数后端 (gmpy2.invert 或 pow(a, -1, n)) 完成"""
+    if a % n == 0: raise ZeroDivisionError("inverse of 0 does not exist")
+    return int(field.invert(a, n))
+
+# -- 椭圆曲线运算 --
+# 点运算、Jacobian 坐标与 w-NAF 多标量乘法都由参数化引擎 weierstrass.Curve 实现，
+# 下面的模块级函数委托给 SM2_CURVE；本模块另外提供 G 的固定基表、预热与大整数后端切换。
+# 坐标在 to_jacobian 中转为后端的整数类型 (gmpy2.mpz 或 int)，预计算表也保存该类型；
+# from_jacobian 等对外返回仿射点的地方再转回 int，调用方不感知后端。
+def is_on_curve(p: Point) -> bool:
+    return SM2_CURVE.is_on_curve(p)
+def point_neg(p: Point) -> Union[Point, None]:
+    return SM2_CURVE.point_neg(p)
+def point_add(p1: Point, p2: Point) -> Union[Point, None]:
+    return SM2_CURVE.point_add(p1, p2)
+
+def scalar_mult_double_and_add(k: int, p: Point) -> Union[Point, None]:
+    """标量乘法 - 原始的 Double-and-add 算法 (用于性能对比)"""
+    return SM2_CURVE.scalar_mult_double_and_add(k, p)
+
+get_naf_w = Curve.naf  # w-NAF 表示 (低位在前)
+
+def to_jacobian(p: Point) -> Union[JacobianPoint, None]:
+    return SM2_CURVE.to_jacobian(p)
+
+def from_jacobian(p: JacobianPoint) -> Union[Point, None]:
+    """射影坐标转回仿射坐标 (一次求逆)"""
+    return SM2_CURVE.from_jacobian(p)
+
+def batch_from_jacobian(points: List[JacobianPoint]) -> List[Union[Point, None]]:
+    """批量转回仿射坐标，所有点共用一次求逆；坐标保持后端类型，供预计算表使用"""
+    return SM2_CURVE.batch_from_jacobian(points)
+
+def jacobian_neg(p: JacobianPoint) -> Union[JacobianPoint, None]:
+    return SM2_CURVE.jacobian_neg(p)
+
+def jacobian_double(p: JacobianPoint) -> Union[JacobianPoint, None]:
+    """Jacobian 倍点，SM2 曲线 a = -3: 3X^2 + aZ^4 = 3(X - Z^2)(X + Z^2)"""
+    return SM2_CURVE.jacobian_double(p)
+
+def jacobian_add(p1: JacobianPoint, p2: JacobianPoint) -> Union[JacobianPoint, None]:
+    return SM2_CURVE.jacobian_add(p1, p2)
+
+def jacobian_add_affine(p1: JacobianPoint, p2: Point) -> Union[JacobianPoint, None]:
+    return SM2_CURVE.jacobian_add_affine(p1, p2)
+
+def precompute_odd_multiples(p: Point, width: int = 5) -> List[Point]:
+    """w-NAF 预计算表: [1P, 3P, ..., (2^(w-1)-1)P]，第 i 项为 (2i+1)P (Jacobian 下构建后批量转为仿射)"""
+    return SM2_CURVE.precompute_odd_multiples(p, width)
+
+def multi_scalar_mult(scalars: List[int], tables: List[List]) -> Union[Point, None]:
+    """交错 w-NAF 多标量乘法 Σ k_i * P_i，所有项共享同一串倍点 (Straus/Shamir 技巧)
+
+    tables[i] 为 P_i 的奇数倍表 (见 precompute_odd_multiples)，窗口宽度由表长决定；
+    表项可以是 Jacobian 点，也可以是仿射点 (此时使用混合加法)。
+    """
+    _count_use()
+    return from_jacobian(_multi_scalar_mult_jacobian(scalars, tables))
+
+def _multi_scalar_mult_jacobian(scalars: List[int], tables: List[List]) -> Union[JacobianPoint, None]:
+    return SM2_CURVE.multi_scalar_mult_jacobian([k % N for k in scalars], tables)
+
+def scalar_mult(k: int, p: Point, width: int = 5) -> Union[Point, None]:
+    """标量乘法 - 优化后的 w-NAF 算法 (Jacobian 坐标，仅在末尾求一次逆)"""
+    if p is None or k % N == 0: return None
+    return multi_scalar_mult([k], [precompute_odd_multiples(p, width)])
+
+# -- 冷启动与预热 --
+# 构建完整的固定基表约需数十毫秒，导入 gmpy2 也要数十毫秒，而一次 w-NAF 标量乘法只需一两毫秒。
+# 因此进程启动时先用 Python int 和 G 的小奇数倍表；标量乘法累计达到 WARMUP_THRESHOLD 次
+# (说明是长期运行的进程) 后才切换到 gmpy2 (SM2_BIGINT 未指定时)，k*G 达到该次数后才构建固定基表。
+# 长期运行的服务可以在启动时直接调用 warm_up()。
+WARMUP_THRESHOLD = 32
+_uses = 0
+_base_uses = 0
+
+def use_bigint_backend(name: str = None) -> str:
+    """切换 field 的大整数后端，并同步本模块热循环中直接使用的 P 与 mpz"""
+    global P, mpz
+    backend = field.set_bigint_backend(name)
+    P, mpz = field.P, field.mpz
+    SM2_CURVE.p = P
+    return backend
+
+def warm_up() -> None:
+    """立即切换到最快的大整数后端并准备 G 的固定基表"""
+    if field.BIGINT_SETTING == 'auto': use_bigint_backend()
+    get_base_table()
+
+def _count_use() -> None:
+    global _uses
+    _uses += 1
+    if _uses == WARMUP_THRESHOLD and field.BIGINT_SETTING == 'auto': use_bigint_backend()
+
+# -- 基点 G 的固定基预计算表 --
+# 表的第 i 行存放 j * 2^(width*i) * G (j = 1..2^(width-1)) 的仿射坐标。
+# 把 k 拆成带符号的 width 位数字后，k*G 只需逐行查表做混合加法，完全不需要倍点。
+# 表在预热后构建；设置环境变量 SM2_G_TABLE 可将其缓存到磁盘，后续进程在第一次 k*G 时直接加载。
+BASE_TABLE_WIDTH = 6
+_BASE_TABLE_MAGIC = b'SM2G'
+# save_base_table 输出的规范表文件 (含文件头) 的 SHA-256，按窗口宽度索引
+_BASE_TABLE_SHA256 = {6: 'b2febca022c13a84f64d9a00435285e92170115e30f4a6f243424a4013471868'}
+_base_table = None
+_base_odd = None
+
+def _signed_digits(k: int, width: int) -> List[int]:
+    """把 k 拆为 width 位的带符号数字 d_i ∈ (-2^(w-1), 2^(w-1)]，k = Σ d_i * 2^(w*i)"""
+    digits, mask, half = [], (1 << width) - 1, 1 << (width - 1)
+    while k:
+        d = k & mask
+        k >>= width
+        if d > half:
+            d -= 1 << width
+            k += 1
+        digits.append(d)
+    return digits
+
+def build_base_table(width: int = BASE_TABLE_WIDTH) -> List[List[Point]]:
+    """构建 G 的固定基预计算表"""
+    rows = -(-(N.bit_length() + 1) // width)
+    table = []
+    base = to_jacobian((Gx, Gy))
+    for _ in range(rows):
+        row, current = [], base
+        for _ in range(1 << (width - 1)):
+            row.append(current)
+            current = jacobian_add(current, base)
+        table.append(batch_from_jacobian(row))
+        base = jacobian_double(row[-1])  # 2^(w-1) * base 再倍一次即 2^w * base
+    return table
+
+def save_base_table(path: str, table: List[List[Point]] = None) -> None:
+    """将预计算表写入磁盘: 魔数 | width | 行数 | 每个点 64 字节 (x || y)"""
+    table = table if table is not None else get_base_table()
+    width = len(table[0]).bit_length()
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # 先写临时文件再替换，避免并发进程读到半个文件
+    with open(tmp_path, 'wb') as f:
+        f.write(_BASE_TABLE_MAGIC + bytes([width, len(table)]))
+        for row in table:
+            for x, y in row:
+                f.write(x.to_bytes(32, 'big') + y.to_bytes(32, 'big'))
+    os.replace(tmp_path, path)
+
+def load_base_table(path: str) -> List[List[Point]]:
+    """从磁盘加载预计算表；内容须与该窗口宽度的规范表逐字节一致 (按 SHA-256 摘要核对)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != _BASE_TABLE_MAGIC: raise ValueError("Not an SM2 base table file.")
+    width, rows = data[4], data[5]
+    if width not in _BASE_TABLE_SHA256 or rows != -(-(N.bit_length() + 1) // width):
+        raise ValueError("SM2 base table has the wrong shape.")
+    row_len = 1 << (width - 1)
+    if len(data) != 6 + rows * row_len * 64: raise ValueError("Truncated SM2 base table file.")
+    # 表错会让 k*G 静默出错；逐点重算比直接构建还慢，改为核对固定摘要
+    if hashlib.sha256(data).hexdigest() != _BASE_TABLE_SHA256[width]: raise ValueError("SM2 base table does not match G.")
+    points = [(mpz(int.from_bytes(data[i:i+32], 'big')), mpz(int.from_bytes(data[i+32:i+64], 'big')))
+              for i in range(6, len(data), 64)]
+    return [points[i:i+row_len] for i in range(0, len(points), row_len)]
+
+def get_base_table() -> List[List[Point]]:
+    """返回 (必要时构建) 模块级 G 预计算表"""
+    global _base_table
+    if _base_table is None:
+        path = os.environ.get('SM2_G_TABLE')
+        if path and os.path.exists(path):
+            _base_table = load_base_table(path)
+        else:
+            _base_table = build_base_table()
+            if path: save_base_table(path, _base_table)
+    return _base_table
+
+def base_odd_multiples() -> List[Point]:
+    """G 的 w-NAF 奇数倍表 [1G, 3G, ..., 31G] (仿射坐标)
+
+    固定基表已存在时直接取其第一行，否则单独构建这 16 个点，验签不需要完整的固定基表。
+    """
+    global _base_odd
+    if _base_table is not None: return _base_table[0][0::2]
+    if _base_odd is None: _base_odd = precompute_odd_multiples((Gx, Gy), BASE_TABLE_WIDTH)
+    return _base_odd
+
+def _scalar_mult_base_jacobian(k: int) -> Union[JacobianPoint, None]:
+    global _base_uses
+    k %= N
+    if k == 0: return None
+    _count_use()
+    table = _base_table
+    if table is None:
+        _base_uses += 1
+        if _base_uses < WARMUP_THRESHOLD and not os.environ.get('SM2_G_TABLE'):
+            return _multi_scalar_mult_jacobian([k], [base_odd_multiples()])
+        table = get_base_table()
+    width = len(table[0]).bit_length()
+    add, p = SM2_CURVE.jacobian_add_affine, SM2_CURVE.p
+    result = None
+    for row, d in zip(table, _signed_digits(k, width)):
+        if d > 0:
+            result = add(result, row[d - 1])
+        elif d < 0:
+            x, y = row[-d - 1]
+            result = add(result, (x, p - y))
+    return result
+
+def scalar_mult_base(k: int) -> Union[Point, None]:
+    """固定基标量乘法 k*G：查表 + 混合加法，不做倍点 (预热前使用普通 w-NAF)"""
+    return from_jacobian(_scalar_mult_base_jacobian(k))
+
+# -- 点编码 --
+# compressed: 02/03 || x (33 字节，前缀的最低位为 y 的奇偶)；uncompressed: 04 || x || y (65 字节)，
+# 两者同 SEC1；raw: 不带前缀的 x || y (64 字节)，即本仓库原有的公钥和 C1 格式。
+POINT_FORMATS = {'raw': 64, 'uncompressed': 65, 'compressed': 33}
+
+def encode_point(p: Point, point_format: str = 'uncompressed') -> bytes:
+    x, y = p
+    if point_format == 'compressed': return bytes([2 | (y & 1)]) + x.to_bytes(32, 'big')
+    raw = x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+    if point_format == 'uncompressed': return b'\x04' + raw
+    if point_format == 'raw': return raw
+    raise ValueError(f"Unknown point format: {point_format}")
+
+def decode_point(data) -> Point:
+    """解码上述三种格式 (按长度区分)，并检查结果在曲线上"""
+    data = bytes(data)
+    if len(data) == 33 and data[0] in (2, 3): return _decompress_point(data)
+    if len(data) == 65 and data[0] == 4: data = data[1:]
+    if len(data) != 64: raise ValueError("Invalid point encoding.")
+    p = (int.from_bytes(data[:32], 'big'), int.from_bytes(data[32:], 'big'))
+    if not is_on_curve(p): raise ValueError("Point is not on the curve.")
+    return p
+
+@lru_cache(maxsize=4096)
+def _decompress_point(data: bytes) -> Point:
+    """由 02/03 || x 恢复 y；按编码做 LRU 缓存，重复解压同一公钥不再开方"""
+    x = int.from_bytes(data[1:], 'big')
+    if x >= P: raise ValueError("Point is not on the curve.")
+    try:
+        y = fp_sqrt(fp_mul_add(fp_mul_add(x, x, A), x, B))  # y^2 = (x^2 + a)x + b
+    except ValueError:
+        raise ValueError("Point is not on the curve.") from None
+    if y & 1 != data[0] & 1:
+        if y == 0: raise ValueError("Point is not on the curve.")
+        y = P - y
+    return (x, int(y))
+
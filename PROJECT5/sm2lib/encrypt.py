@@ -0,0 +1,124 @@
+import secrets
+from typing import Tuple
+
+from . import sm3
+from .curve import N, POINT_FORMATS, decode_point, encode_point, scalar_mult, scalar_mult_base
+from .sm3 import SM3, iter_chunks, sm3_hash as get_hash
+
+# -- SM2 公钥加密 (GB/T 32918.4) --
+# 密文格式为 C1 || C3 || C2；KDF 为标准的计数器模式，EncryptionMixin 提供 SM2Key 的加解密方法。
+
+# 各 SM3 后端下改用 sm3_hash_many 的最少分组数 (实测的盈亏平衡点)
+_KDF_BATCH_MIN = {'simd': 512, 'python': 16}
+
+class KDFStream:
+    """SM2 密钥派生函数 (GB/T 32918.4 5.4.3) 的惰性密钥流: K = SM3(Z || 1) || SM3(Z || 2) || ...
+
+    read(n) 按需生成后续 n 字节；分组数较多时通过 sm3_hash_many 一次批量计算，
+    较少时逐个调用 get_hash (NumPy 批量计算有约数毫秒的固定开销)。
+    """
+    def __init__(self, z: bytes):
+        self._z = bytes(z)
+        self._counter = 1
+        self._buf = b''
+
+    def _blocks(self, count: int) -> bytes:
+        if self._counter + count - 1 > 0xFFFFFFFF: raise ValueError("KDF output length exceeds the counter range.")
+        inputs = [self._z + (self._counter + i).to_bytes(4, 'big') for i in range(count)]
+        self._counter += count
+        if count < _KDF_BATCH_MIN.get(sm3.get_backend(), 16):
+            return b''.join(get_hash(x) for x in inputs)
+        from .sm3_batch import sm3_hash_many  # 延迟导入，只在真正需要时加载 NumPy
+        return b''.join(sm3_hash_many(inputs))
+
+    def read(self, n: int) -> bytes:
+        need = n - len(self._buf)
+        if need > 0: self._buf += self._blocks(-(-need // 32))
+        out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+def kdf(z: bytes, klen: int) -> bytes:
+    """派生 klen 字节密钥"""
+    return KDFStream(z).read(klen)
+
+def xor_bytes(a, b) -> bytes:
+    """按字节异或两段等长数据，借助大整数一次完成"""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+class EncryptionMixin:
+    """SM2Key 的加解密方法，要求实例具有 private_key / public_key 属性"""
+
+    def _encrypt_setup(self, point_format: str) -> Tuple[bytes, bytes, bytes]:
+        """选取 k，返回 (C1, x2 字节, y2 字节)"""
+        k = secrets.randbelow(N - 1) + 1
+        c1 = encode_point(scalar_mult_base(k), point_format)
+        x2, y2 = scalar_mult(k, self.public_key)
+        return c1, x2.to_bytes(32, 'big'), y2.to_bytes(32, 'big')
+
+    def _decrypt_setup(self, c1: bytes) -> Tuple[bytes, bytes]:
+        if not self.private_key: raise ValueError("Private key is not available for decryption.")
+        try:
+            c1_point = decode_point(c1)
+        except ValueError:
+            raise ValueError("C1 is not a valid point on the curve.") from None
+        x2, y2 = scalar_mult(self.private_key, c1_point)
+        return x2.to_bytes(32, 'big'), y2.to_bytes(32, 'big')
+
+    # 加解密的 point_format 指定 C1 的编码 (见 POINT_FORMATS)，解密时须与加密一致；
+    # 默认 raw 与原来的 64 字节 C1 及 gmssl 兼容，compressed 可使每条密文少 31 字节。
+    def encrypt(self, plain_bytes: bytes, point_format: str = 'raw') -> bytes:
+        while True:
+            c1, x2, y2 = self._encrypt_setup(point_format)
+            t = kdf(x2 + y2, len(plain_bytes))
+            if plain_bytes and not any(t): continue  # t 全零时重新选取 k
+            c2 = xor_bytes(plain_bytes, t)
+            h = SM3(x2); h.update(plain_bytes); h.update(y2)
+            return c1 + h.digest() + c2
+
+    def decrypt(self, cipher_bytes: bytes, point_format: str = 'raw') -> bytes:
+        cipher = memoryview(cipher_bytes)
+        c1_len = POINT_FORMATS[point_format]
+        if len(cipher) < c1_len + 32: raise ValueError("Ciphertext is too short.")
+        x2, y2 = self._decrypt_setup(cipher[:c1_len])
+        c3, c2 = cipher[c1_len:c1_len + 32], cipher[c1_len + 32:]
+        t = kdf(x2 + y2, len(c2))
+        if c2 and not any(t): raise ValueError("Decryption failed. KDF output is all zero.")
+        m_prime = xor_bytes(c2, t)
+        h = SM3(x2); h.update(m_prime); h.update(y2)
+        if h.digest() != c3: raise ValueError("Decryption failed. Hash check invalid.")
+        return m_prime
+
+    def encrypt_stream(self, source, dest, chunk_size: int = 1 << 20, point_format: str = 'raw') -> None:
+        """流式加密: 从 source (文件对象或字节块迭代器) 读取明文，把 C1 || C3 || C2 写入 dest
+
+        dest 需要支持 seek，C3 先以占位写出，处理完全部明文后回填。内存占用只与 chunk_size 有关。
+        """
+        c1, x2, y2 = self._encrypt_setup(point_format)
+        keystream, h = KDFStream(x2 + y2), SM3(x2)
+        c3_offset = dest.tell() + len(c1)
+        dest.write(c1 + bytes(32))
+        for chunk in iter_chunks(source, chunk_size):
+            h.update(chunk)
+            dest.write(xor_bytes(chunk, keystream.read(len(chunk))))
+        h.update(y2)
+        end = dest.tell()
+        dest.seek(c3_offset)
+        dest.write(h.digest())
+        dest.seek(end)
+
+    def decrypt_stream(self, source, dest, chunk_size: int = 1 << 20, point_format: str = 'raw') -> None:
+        """流式解密: 从文件对象 source 读取 C1 || C3 || C2，把明文写入 dest
+
+        C3 只能在读完全部密文后校验，校验失败时抛出 ValueError，此时已写入 dest 的内容必须丢弃。
+        """
+        c1_len = POINT_FORMATS[point_format]
+        header = source.read(c1_len + 32)
+        if len(header) != c1_len + 32: raise ValueError("Ciphertext is too short.")
+        x2, y2 = self._decrypt_setup(header[:c1_len])
+        keystream, h = KDFStream(x2 + y2), SM3(x2)
+        for chunk in iter_chunks(source, chunk_size):
+            plain = xor_bytes(chunk, keystream.read(len(chunk)))
+            h.update(plain)
+            dest.write(plain)
+        h.update(y2)
+        if h.digest() != header[c1_len:]: raise ValueError("Decryption failed. Hash check invalid.")
@@ -0,0 +1,203 @@
+import os
+from typing import List
+
+# -- 大整数后端 --
+# gmpy2 后端中 P 取 gmpy2.mpz，域运算中的乘法、约减、求逆和模幂都在 GMP 中完成；python 后端使用 Python int。
+# 导入 gmpy2 本身要数十毫秒 (它会加载 importlib.metadata)，对只做几次运算的短命进程得不偿失，
+# 因此模块导入时总是先用 python 后端，由 set_bigint_backend() 按需切换 (curve 在预热后自动切换，见 curve.py)。
+# 环境变量 SM2_BIGINT: gmpy2 = 导入时即切换，python = 从不切换，未设置 = 自动。
+# mpz 与 int 可混合运算、相等时哈希相同，curve 只在对外返回点坐标和签名时转回 int。
+BIGINT_SETTING = os.environ.get('SM2_BIGINT', 'auto')
+
+def _invert_python(a: int, n: int) -> int:
+    return pow(a, -1, n)
+
+def _powmod_python(a: int, e: int, n: int) -> int:
+    return pow(a, e, n)
+
+BIGINT_BACKEND, mpz, invert, powmod = 'python', int, _invert_python, _powmod_python
+
+# -- SM2 素域 Fp 运算 --
+# P = 2^256 - 2^224 - 2^96 + 2^64 - 1 是广义梅森 (Solinas) 素数，
+# 因此 2^256 ≡ 2^224 + 2^96 - 2^64 + 1 (mod P)，高位可以直接折叠回低位。
+P_INT = 0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFF
+P = P_INT
+_MASK256 = (1 << 256) - 1
+_SQRT_EXP = (P_INT + 1) // 4
+
+def set_bigint_backend(name: str = None) -> str:
+    """切换大整数后端 ('gmpy2' / 'python')，返回实际使用的后端
+
+    name 为 None 时 gmpy2 可用即用。已经用 `from field import P` 绑定的模块需要自行重新读取 P 和 mpz。
+    """
+    global BIGINT_BACKEND, mpz, invert, powmod, P, _SQRT_EXP
+    if name != 'python':
+        try:
+            import gmpy2
+        except ImportError:
+            if name == 'gmpy2': raise
+            name = 'python'
+        else:
+            BIGINT_BACKEND, mpz, invert, powmod = 'gmpy2', gmpy2.mpz, gmpy2.invert, gmpy2.powmod
+    if name == 'python':
+        BIGINT_BACKEND, mpz, invert, powmod = 'python', int, _invert_python, _powmod_python
+    P, _SQRT_EXP = mpz(P_INT), mpz((P_INT + 1) // 4)
+    return BIGINT_BACKEND
+
+if BIGINT_SETTING == 'gmpy2': set_bigint_backend('gmpy2')
+
+def fp_reduce_solinas(c: int) -> int:
+    """利用 P 的特殊形式约减非负整数 c (只用移位和加减)"""
+    hi = c >> 256
+    while hi:
+        c = (c & _MASK256) + (hi << 224) + (hi << 96) - (hi << 64) + hi
+        hi = c >> 256
+    return c - P if c >= P else c
+
+def fp_reduce(c: int) -> int:
+    """约减到 [0, P)
+
+    CPython 的大整数取模由 C 实现，在 512 位乘积上比纯 Python 的 Solinas 折叠更快
+    (见本文件 __main__ 中的基准)，因此默认路径直接使用 %。
+    """
+    return c % P
+
+def fp_add(a: int, b: int) -> int:
+    return (a + b) % P
+
+def fp_sub(a: int, b: int) -> int:
+    return (a - b) % P
+
+def fp_mul(a: int, b: int) -> int:
+    return a * b % P
+
+def fp_sqr(a: int) -> int:
+    return a * a % P
+
+def fp_mul_add(a: int, b: int, c: int) -> int:
+    """a*b + c，只做一次约减"""
+    return (a * b + c) % P
+
+def fp_mul_sub(a: int, b: int, c: int) -> int:
+    """a*b - c，只做一次约减"""
+    return (a * b - c) % P
+
+def inv_mod(a: int, n: int) -> int:
+    """模 n 求逆
+
+    gmpy2.invert 或 pow(a, -1, n)：均在 C 层执行扩展欧几里得，基准中快于费马小定理
+    pow(a, P-2, P) 和纯 Python 的二进制 GCD。weierstrass.Curve 的域运算也用它 (n 为各曲线的 p)。
+    """
+    if a % n == 0: raise ZeroDivisionError("inverse of 0 does not exist")
+    return invert(a, n)
+
+def batch_inv_mod(values: List[int], n: int) -> List[int]:
+    """Montgomery 批量求逆: 元素只做 1 次求逆和约 3(len-1) 次乘法"""
+    prefix, acc = [], 1
+    for v in values:
+        if v % n == 0: raise ZeroDivisionError("inverse of 0 does not exist")
+        prefix.append(acc)
+        acc = acc * v % n
+    acc_inv = inv_mod(acc, n)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = acc_inv * prefix[i] % n  # (v_0 ... v_i)^-1 * (v_0 ... v_{i-1}) = v_i^-1
+        acc_inv = acc_inv * values[i] % n
+    return result
+
+def fp_inv(a: int) -> int:
+    """Fp 上求逆"""
+    return inv_mod(a, P)
+
+def fp_batch_inv(values: List[int]) -> List[int]:
+    """Fp 上的批量求逆"""
+    return batch_inv_mod(values, P)
+
+def fp_sqrt(a: int) -> int:
+    """Fp 上开平方: P ≡ 3 (mod 4)，a 的平方根为 a^((P+1)/4)，只需一次模幂
+
+    a 不是二次剩余时抛出 ValueError。
+    """
+    root = powmod(a, _SQRT_EXP, P)
+    if root * root % P != a % P: raise ValueError("Not a quadratic residue.")
+    return root
+
+def fp_inv_fermat(a: int) -> int:
+    """费马小定理求逆 a^(P-2)，仅用于基准对比"""
+    if a % P == 0: raise ZeroDivisionError("inverse of 0 does not exist")
+    return powmod(a, P - 2, P)
+
+def fp_inv_binary(a: int) -> int:
+    """二进制扩展 GCD 求逆，仅用于基准对比"""
+    u, v, x1, x2 = a % P, P, 1, 0
+    if u == 0: raise ZeroDivisionError("inverse of 0 does not exist")
+    while u != 1 and v != 1:
+        while u & 1 == 0:
+            u >>= 1
+            x1 = x1 >> 1 if x1 & 1 == 0 else (x1 + P) >> 1
+        while v & 1 == 0:
+            v >>= 1
+            x2 = x2 >> 1 if x2 & 1 == 0 else (x2 + P) >> 1
+        if u >= v:
+            u -= v; x1 -= x2
+        else:
+            v -= u; x2 -= x1
+    return (x1 if u == 1 else x2) % P
+
+def _inv_euclid(a: int, n: int) -> int:
+    """原 sm2.py / sm2_opt.py 中的纯 Python 扩展欧几里得，仅用于基准对比"""
+    lm, hm, low, high = 1, 0, a % n, n
+    while low > 1:
+        r = high // low
+        nm, new = hm - lm * r, high - low * r
+        lm, low, hm, high = nm, new, lm, low
+    return lm % n
+
+
+if __name__ == '__main__':
+    import random
+    import timeit
+    set_bigint_backend(None if BIGINT_SETTING == 'auto' else BIGINT_SETTING)
+    samples = [(random.randrange(1, P), random.randrange(1, P)) for _ in range(1000)]
+    for a, b in samples[:100]:
+        assert fp_reduce_solinas(a * b) == a * b % P
+        assert fp_inv(a) == fp_inv_fermat(a) == fp_inv_binary(a) == _inv_euclid(a, P)
+    assert all(fp_sqrt(a * a) in (a % P, P - a % P) for a, _ in samples[:100])
+    assert fp_batch_inv([a for a, _ in samples]) == [fp_inv(a) for a, _ in samples]
+
+    def bench(name, fn, number):
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{name:<28}{best / number / len(samples) * 1e9:>10.1f} ns/op")
+
+    print("===乘法约减===")
+    bench("a*b % P", lambda: [a * b % P for a, b in samples], 20)
+    bench("fp_reduce_solinas(a*b)", lambda: [fp_reduce_solinas(a * b) for a, b in samples], 20)
+    bench("fp_mul(a, b)", lambda: [fp_mul(a, b) for a, b in samples], 20)
+    bench("fp_mul_add(a, b, a)", lambda: [fp_mul_add(a, b, a) for a, b in samples], 20)
+
+    print("===求逆===")
+    bench("inv (Python Euclid)", lambda: [_inv_euclid(a, P) for a, _ in samples], 2)
+    bench(f"fp_inv ({BIGINT_BACKEND})", lambda: [fp_inv(a) for a, _ in samples], 2)
+    bench("fp_inv_fermat", lambda: [fp_inv_fermat(a) for a, _ in samples], 2)
+    bench("fp_inv_binary", lambda: [fp_inv_binary(a) for a, _ in samples], 2)
+    bench("fp_batch_inv (均摊)", lambda: fp_batch_inv([a for a, _ in samples]), 2)
+
+    if BIGINT_BACKEND == 'gmpy2':
+        import gmpy2
+        # 同一运算分别用 Python int 和 gmpy2.mpz 计时，给出每种运算的加速比
+        print("===大整数后端 (int / mpz)===")
+        ints = [(int(a), int(b)) for a, b in samples]
+        mpzs = [(gmpy2.mpz(a), gmpy2.mpz(b)) for a, b in samples]
+        p_int, p_mpz, e_int = P_INT, gmpy2.mpz(P_INT), (P_INT + 1) // 4
+        cases = [
+            ("a*b % P", 20, lambda xs, p: [a * b % p for a, b in xs]),
+            ("(a+b) % P", 20, lambda xs, p: [(a + b) % p for a, b in xs]),
+            ("a*b + a % P", 20, lambda xs, p: [(a * b + a) % p for a, b in xs]),
+            ("求逆", 2, lambda xs, p: [pow(a, -1, p) if type(p) is int else gmpy2.invert(a, p) for a, _ in xs]),
+            ("开方 a^((P+1)/4)", 1, lambda xs, p: [pow(a, e_int, p) if type(p) is int else gmpy2.powmod(a, e_int, p) for a, _ in xs[:100]]),
+        ]
+        for name, number, fn in cases:
+            count = 100 if name.startswith("开方") else len(samples)
+            t_int = min(timeit.repeat(lambda: fn(ints, p_int), number=number, repeat=5)) / number / count
+            t_mpz = min(timeit.repeat(lambda: fn(mpzs, p_mpz), number=number, repeat=5)) / number / count
+            print(f"{name:<22}{t_int * 1e9:>10.1f} ns{t_mpz * 1e9:>10.1f} ns{t_int / t_mpz:>8.2f}x")
@@ -0,0 +1,42 @@
+import secrets
+from typing import Union, List
+
+from .curve import N, Gx, Gy, Point, _scalar_mult_base_jacobian, batch_from_jacobian, decode_point, encode_point, \
+    scalar_mult_base
+from .encrypt import EncryptionMixin
+from .sign import NoncePool, SignatureMixin
+
+class SM2Key(SignatureMixin, EncryptionMixin):
+    """SM2 密钥: 签名验签见 sign.SignatureMixin，加解密见 encrypt.EncryptionMixin"""
+    def __init__(self, private_key: int = None, public_key: Union[Point, bytes] = None, nonce_pool: NoncePool = None):
+        """public_key 可以是 (x, y) 或 decode_point 支持的任一种字节编码"""
+        self.G = (Gx, Gy)
+        if isinstance(public_key, (bytes, bytearray, memoryview)): public_key = decode_point(public_key)
+        if nonce_pool is not None: self.nonce_pool = nonce_pool
+        if private_key:
+            self.private_key = private_key
+            self.public_key = scalar_mult_base(private_key)
+        elif public_key:
+            self.public_key = public_key
+            self.private_key = None
+        else:
+            self.private_key = secrets.randbelow(N - 2) + 1  # d ∈ [1, n-2]，由 CSPRNG 生成
+            self.public_key = scalar_mult_base(self.private_key)
+
+    def public_key_bytes(self, point_format: str = 'compressed') -> bytes:
+        return encode_point(self.public_key, point_format)
+
+def generate_keypairs(n: int) -> List[SM2Key]:
+    """批量生成 n 个密钥对
+
+    公钥先以 Jacobian 坐标计算，再共用一次批量求逆统一转为仿射坐标，
+    避免每个密钥单独求逆。
+    """
+    private_keys = [secrets.randbelow(N - 2) + 1 for _ in range(n)]
+    public_keys = batch_from_jacobian([_scalar_mult_base_jacobian(d) for d in private_keys])
+    keys = []
+    for d, public_key in zip(private_keys, public_keys):
+        key = SM2Key.__new__(SM2Key)
+        key.G, key.private_key, key.public_key = (Gx, Gy), d, (int(public_key[0]), int(public_key[1]))
+        keys.append(key)
+    return keys
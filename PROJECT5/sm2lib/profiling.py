@@ -0,0 +1,228 @@
+import functools
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from . import curve, encrypt, field, sign, sm3, weierstrass
+
+# -- 可选的热点计数与分阶段计时 --
+# 启用时把热点函数替换为计数 / 计时的包装函数，停用时换回原函数；未启用时没有任何包装，开销为零。
+#
+#   with Profiler() as prof:
+#       key.sign(b'message')
+#   prof.to_dict(); prof.to_prometheus()
+#
+# 计数器: point_add (仿射加法)、jacobian_double / jacobian_add / jacobian_add_affine (倍点与加法，
+# 统计所有 weierstrass.Curve 实例，SM2 的模块级函数也由 SM2_CURVE 执行)、
+# inv (模 n 等通用求逆)、fp_inv (素域求逆，含批量求逆内部的一次)、fp_batch_inv、
+# sm3_blocks (压缩的分组数，含 sm3_hash_many 的每个通道) 与 sm3_bytes (送入哈希的消息字节数)。
+# 计时: sign / verify / encrypt / decrypt 及其 *_stream 版本的总耗时 (total) 和各阶段:
+# z (签名时计算 Z；验签时为公钥缓存查询，未命中时包括 Z 与预计算表)、e (SM3(Z || M))、
+# scalar_mult (标量乘法)、kdf。阶段只计最外层，不在任何操作内的调用记在空操作名下。
+#
+# 同一时刻只能启用一个 Profiler；包装函数是进程级的，计数在所有线程上累计 (不加锁，并发时可能略少)，
+# 阶段按线程归属。进程池 worker (verify_batch、sm2lib.server) 中的运算不计入。
+
+_COUNTED = [  # (所属模块或类, 函数名, 计数器名)
+    (weierstrass.Curve, 'point_add', 'point_add'),
+    (weierstrass.Curve, 'jacobian_double', 'jacobian_double'),
+    (weierstrass.Curve, 'jacobian_add', 'jacobian_add'),
+    (weierstrass.Curve, 'jacobian_add_affine', 'jacobian_add_affine'),
+    (curve, 'inv', 'inv'),
+    (field, 'inv_mod', 'fp_inv'),
+    (field, 'batch_inv_mod', 'fp_batch_inv'),
+]
+_OPERATIONS = [(sign.SignatureMixin, name) for name in ('sign', 'verify', 'sign_stream', 'verify_stream')] + \
+              [(encrypt.EncryptionMixin, name) for name in ('encrypt', 'decrypt', 'encrypt_stream', 'decrypt_stream')]
+_PHASES = [  # (所属模块或类, 函数名, 阶段名)
+    (sign.SignatureMixin, '_get_z', 'z'),
+    (sign.PublicKeyCache, 'get', 'z'),
+    (sign.SignatureMixin, '_digest', 'e'),
+    (curve, 'scalar_mult', 'scalar_mult'),
+    (curve, 'scalar_mult_base', 'scalar_mult'),
+    (curve, 'multi_scalar_mult', 'scalar_mult'),
+    (encrypt, 'kdf', 'kdf'),
+    (encrypt.KDFStream, 'read', 'kdf'),
+]
+
+_active = None
+
+class Profiler:
+    """热点计数与分阶段计时，可作为上下文管理器使用，也可手动 enable() / disable()"""
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.timings: Dict[tuple, List] = {}  # (操作, 阶段) -> [调用次数, 累计秒数]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patches = []
+
+    def __enter__(self) -> 'Profiler':
+        self.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.disable()
+
+    def reset(self) -> None:
+        self.counters.clear()
+        with self._lock:
+            self.timings.clear()
+
+    def enable(self) -> None:
+        global _active
+        if _active is not None: raise RuntimeError("Another Profiler is already enabled.")
+        _active = self
+        module_funcs = {}  # 原函数 -> 包装函数，需在所有导入了该函数的模块中替换
+        for owner, name, counter in _COUNTED:
+            if isinstance(owner, type):
+                self._patch_attr(owner, name, self._counting(owner.__dict__[name], counter))
+            else:
+                module_funcs[getattr(owner, name)] = self._counting(getattr(owner, name), counter)
+        for owner, name, phase in _PHASES:
+            if isinstance(owner, type):
+                self._patch_attr(owner, name, self._timing(owner.__dict__[name], phase))
+            else:
+                module_funcs[getattr(owner, name)] = self._timing(getattr(owner, name), phase)
+        for owner, name in _OPERATIONS:
+            self._patch_attr(owner, name, self._operation(owner.__dict__[name], name))
+        module_funcs[sm3.compress_blocks] = self._counting_sm3(sm3.compress_blocks)
+        self._patch_attr(sm3.SM3, 'update', self._counting_bytes(sm3.SM3.__dict__['update']))
+        if 'sm2lib.sm3_batch' in sys.modules:  # 未导入时 sm3_hash_many 尚未被用过，其后的调用不计通道分组
+            batch = sys.modules['sm2lib.sm3_batch']
+            module_funcs[batch._compress_lanes] = self._counting_lanes(batch._compress_lanes)
+            module_funcs[batch._pad] = self._counting_pad(batch._pad)
+        by_id = {id(fn): wrapper for fn, wrapper in module_funcs.items()}
+        # 其他模块可能用 from ... import 持有同一函数对象 (如 sign.py 的 scalar_mult_base)，按对象身份一并替换
+        for module in list(sys.modules.values()):
+            namespace = getattr(module, '__dict__', None)
+            if not isinstance(namespace, dict): continue
+            for key, value in list(namespace.items()):
+                wrapper = by_id.get(id(value))
+                if wrapper is not None: self._patch_attr(module, key, wrapper)
+
+    def disable(self) -> None:
+        global _active
+        if _active is not self: return
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches.clear()
+        _active = None
+
+    def _patch_attr(self, owner, name: str, wrapper: Callable) -> None:
+        self._patches.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, wrapper)
+
+    def _counting(self, fn: Callable, counter: str) -> Callable:
+        counters = self.counters
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            counters[counter] += 1
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def _counting_sm3(self, fn: Callable) -> Callable:
+        counters = self.counters
+        @functools.wraps(fn)
+        def wrapper(v, data):
+            counters['sm3_blocks'] += len(data) // 64
+            return fn(v, data)
+        return wrapper
+
+    def _counting_bytes(self, fn: Callable) -> Callable:
+        counters = self.counters
+        @functools.wraps(fn)
+        def wrapper(h, data):
+            counters['sm3_bytes'] += memoryview(data).nbytes
+            return fn(h, data)
+        return wrapper
+
+    def _counting_lanes(self, fn: Callable) -> Callable:
+        counters = self.counters
+        @functools.wraps(fn)
+        def wrapper(v, block):
+            counters['sm3_blocks'] += len(v[0])
+            return fn(v, block)
+        return wrapper
+
+    def _counting_pad(self, fn: Callable) -> Callable:
+        counters = self.counters
+        @functools.wraps(fn)
+        def wrapper(data):
+            counters['sm3_bytes'] += len(data)
+            return fn(data)
+        return wrapper
+
+    def _record(self, op: str, phase: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.timings.setdefault((op, phase), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def _timing(self, fn: Callable, phase: str) -> Callable:
+        local, record = self._local, self._record
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(local, 'phase', None) is not None: return fn(*args, **kwargs)
+            local.phase = phase
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                local.phase = None
+                record(getattr(local, 'op', None) or '', phase, time.perf_counter() - start)
+        return wrapper
+
+    def _operation(self, fn: Callable, op: str) -> Callable:
+        local, record = self._local, self._record
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(local, 'op', None) is not None: return fn(*args, **kwargs)
+            local.op = op
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                local.op = None
+                record(op, 'total', time.perf_counter() - start)
+        return wrapper
+
+    def to_dict(self) -> Dict:
+        """{'counters': {名字: 次数}, 'timings': {'操作.阶段': {'calls': 次数, 'seconds': 秒}}}"""
+        with self._lock:
+            timings = {f"{op}.{phase}" if op else phase: {'calls': calls, 'seconds': seconds}
+                       for (op, phase), (calls, seconds) in sorted(self.timings.items())}
+        return {'counters': dict(sorted(self.counters.items())), 'timings': timings}
+
+    def to_prometheus(self, prefix: str = 'sm2') -> str:
+        """Prometheus 文本格式 (所有指标均为 counter)"""
+        counters = dict(self.counters)
+        lines = [f"# HELP {prefix}_calls_total Calls of instrumented curve and field functions.",
+                 f"# TYPE {prefix}_calls_total counter"]
+        for name, value in sorted(counters.items()):
+            if not name.startswith('sm3_'): lines.append(f'{prefix}_calls_total{{function="{name}"}} {value}')
+        for name, help_text in (('sm3_blocks', "SM3 compression blocks processed."), ('sm3_bytes', "Bytes fed to SM3.")):
+            lines += [f"# HELP {prefix}_{name}_total {help_text}", f"# TYPE {prefix}_{name}_total counter",
+                      f"{prefix}_{name}_total {counters.get(name, 0)}"]
+        with self._lock:
+            timings = sorted(self.timings.items())
+        for metric, index, help_text in (('phase_seconds_total', 1, "Time spent per operation phase."),
+                                         ('phase_calls_total', 0, "Calls per operation phase.")):
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} counter"]
+            for (op, phase), entry in timings:
+                lines.append(f'{prefix}_{metric}{{op="{op}",phase="{phase}"}} {entry[index]}')
+        return '\n'.join(lines) + '\n'
+
+
+if __name__ == '__main__':
+    import json
+    from .key import SM2Key
+
+    key = SM2Key()
+    with Profiler() as prof:
+        signature = key.sign(b'profiling demo')
+        assert key.verify(b'profiling demo', signature)
+        assert key.decrypt(key.encrypt(b'x' * 1024)) == b'x' * 1024
+    print(json.dumps(prof.to_dict(), indent=2))
+    print(prof.to_prometheus())
@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import stat
+import struct
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple, Union
+
+from .curve import Point, encode_point, warm_up
+from .key import SM2Key
+from .sign import DEFAULT_USER_ID
+
+# -- SM2 签名 / 加解密服务 --
+# 本地 asyncio 服务 (Unix socket 或 localhost TCP)。并发到达的请求按时间/数量窗口合并成微批，
+# 整批交给进程池执行，事件循环本身不做任何标量乘法；worker 启动时载入私钥并预热
+# (切换 gmpy2、构建 G 的固定基表)，公钥预计算缓存也在 worker 中长期保留。
+# 服务没有认证，访问控制依赖 socket 文件权限 (0600) 与只绑定回环地址，见 SM2Server.start。
+#
+# 帧格式 (整数均为大端):
+#   请求  length(4) | request_id(4) | op(1) | body       length 为其后的字节数
+#   响应  length(4) | request_id(4) | status(1) | body   status 0 = 成功，1 = 失败 (body 为 UTF-8 错误信息)
+# 各操作的 body:
+#   SIGN     key_id_len(1) | key_id | uid_len(2) | uid | message              -> r(32) | s(32)
+#   VERIFY   pk_len(1) | pk | uid_len(2) | uid | r(32) | s(32) | message      -> 1 字节 (1 = 通过)
+#   ENCRYPT  pk_len(1) | pk | plaintext                                      -> C1 || C3 || C2 (C1 为 raw 格式)
+#   DECRYPT  key_id_len(1) | key_id | ciphertext                             -> plaintext
+#   STATS    空                                                              -> JSON 格式的指标
+# pk 为 decode_point 支持的任一种编码；私钥只保存在服务端，按 key_id 引用。
+# 同一连接上可以有多个未完成的请求，响应按完成顺序返回，用 request_id 对应。
+OP_SIGN, OP_VERIFY, OP_ENCRYPT, OP_DECRYPT, OP_STATS = 1, 2, 3, 4, 5
+OP_NAMES = {OP_SIGN: 'sign', OP_VERIFY: 'verify', OP_ENCRYPT: 'encrypt', OP_DECRYPT: 'decrypt', OP_STATS: 'stats'}
+MAX_FRAME = 16 << 20
+_FRAME = struct.Struct('>IIB')
+
+def _pack_frame(request_id: int, code: int, body: bytes) -> bytes:
+    return _FRAME.pack(len(body) + 5, request_id, code) + body
+
+def _pack_field(data: bytes, size_len: int) -> bytes:
+    if len(data) >> (8 * size_len): raise ValueError("Field is too long.")
+    return len(data).to_bytes(size_len, 'big') + data
+
+def _read_field(body: bytes, offset: int, size_len: int) -> Tuple[bytes, int]:
+    end = offset + size_len + int.from_bytes(body[offset:offset + size_len], 'big')
+    if end > len(body): raise ValueError("Malformed request body.")
+    return body[offset + size_len:end], end
+
+# -- worker 进程 --
+_worker_keys: Dict[bytes, SM2Key] = {}
+
+def _init_worker(keyring: Dict[bytes, int]) -> None:
+    """进程池初始化: 载入私钥并预热"""
+    global _worker_keys
+    _worker_keys = {key_id: SM2Key(private_key=d) for key_id, d in keyring.items()}
+    warm_up()
+
+def _private_key(key_id: bytes) -> SM2Key:
+    key = _worker_keys.get(key_id)
+    if key is None: raise ValueError(f"Unknown key id: {key_id.decode(errors='replace')}")
+    return key
+
+def _read_user_id(body: bytes, offset: int) -> Tuple[str, int]:
+    """user_id 的长度字段有 2 字节，但 Z 中的 ENTL 是以比特计的 16 位数，最多 8191 字节"""
+    user_id, offset = _read_field(body, offset, 2)
+    if len(user_id) > 0xFFFF // 8: raise ValueError("User ID is too long.")
+    return user_id.decode(), offset
+
+def _handle(op: int, body: bytes) -> bytes:
+    if op == OP_SIGN:
+        key_id, offset = _read_field(body, 0, 1)
+        user_id, offset = _read_user_id(body, offset)
+        r, s = _private_key(key_id).sign(body[offset:], user_id)
+        return r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+    if op == OP_VERIFY:
+        public_key, offset = _read_field(body, 0, 1)
+        user_id, offset = _read_user_id(body, offset)
+        if len(body) < offset + 64: raise ValueError("Malformed request body.")
+        signature = (int.from_bytes(body[offset:offset + 32], 'big'), int.from_bytes(body[offset + 32:offset + 64], 'big'))
+        ok = SM2Key(public_key=public_key).verify(body[offset + 64:], signature, user_id)
+        return b'\x01' if ok else b'\x00'
+    if op == OP_ENCRYPT:
+        public_key, offset = _read_field(body, 0, 1)
+        return SM2Key(public_key=public_key).encrypt(body[offset:])
+    if op == OP_DECRYPT:
+        key_id, offset = _read_field(body, 0, 1)
+        return _private_key(key_id).decrypt(body[offset:])
+    raise ValueError(f"Unknown op: {op}")
+
+def _run_batch(batch: List[Tuple[int, bytes]]) -> List[Tuple[int, bytes]]:
+    """在 worker 中执行一个微批，返回与输入顺序一致的 (status, body)；单个请求出错不影响整批"""
+    results = []
+    for op, body in batch:
+        try:
+            results.append((0, _handle(op, body)))
+        except Exception as exc:  # 任何异常都只作用于该请求，不能让同一微批中其他客户端的请求失败
+            results.append((1, (str(exc) or type(exc).__name__).encode()))
+    return results
+
+def _ping() -> None:
+    pass
+
+# -- 指标 --
+class Histogram:
+    """累积直方图，语义同 Prometheus histogram: 每个桶统计 <= 上界的样本数"""
+    def __init__(self, bounds: List[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict:
+        buckets, total = {}, 0
+        for bound, n in zip(self.bounds + ['+Inf'], self.counts):
+            total += n
+            buckets[str(bound)] = total
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+_LATENCY_BOUNDS = [0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0]
+_BATCH_BOUNDS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+# -- 服务端 --
+class SM2Server:
+    """微批处理的 SM2 服务
+
+    keys 为 key_id -> 私钥；batch_size / batch_window (秒) 控制微批: 攒够 batch_size 个请求，
+    或第一个请求等待满 batch_window 时即派发。排队和执行中的请求超过 max_queue 时，新请求直接返回 "Server busy."。
+    """
+    def __init__(self, keys: Dict[str, int], workers: int = None, batch_size: int = 64,
+                 batch_window: float = 0.002, max_queue: int = 10000):
+        self.keys = {key_id.encode(): d for key_id, d in keys.items()}
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_queue = max_queue
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.keys,))
+        self.pending = []   # 尚未派发的 (op, body, future)
+        self.in_flight = 0  # 已派发、尚未完成的请求数
+        self.requests = 0
+        self.errors = 0
+        self.batch_sizes = Histogram(_BATCH_BOUNDS)
+        self.latency = {name: Histogram(_LATENCY_BOUNDS) for name in OP_NAMES.values()}
+        self._flush_handle = None
+        self._server = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.pending) + self.in_flight
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0, path: str = None, allow_remote: bool = False) -> None:
+        """启动 worker 并开始监听；path 非空时使用 Unix socket
+
+        服务不做任何认证，能连上即可用服务端私钥签名/解密: Unix socket 以 0600 权限创建，只有本用户可连接；
+        TCP 只允许绑定回环地址，其他地址须显式传入 allow_remote=True，并由调用方自行做访问控制。
+        """
+        if not path and not allow_remote and not _is_loopback(host):
+            raise ValueError("Refusing to listen on a non-loopback address without allow_remote=True.")
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+        if path:
+            if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode): os.unlink(path)
+            old_umask = os.umask(0o177)  # 在 bind 时即为 0600，不留 chmod 之前的窗口
+            try:
+                self._server = await asyncio.start_unix_server(self._serve_connection, path=path)
+            finally:
+                os.umask(old_umask)
+        else:
+            self._server = await asyncio.start_server(self._serve_connection, host, port)
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.pool.shutdown()
+
+    def metrics(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'queue_depth': self.queue_depth,
+            'pending': len(self.pending),
+            'in_flight': self.in_flight,
+            'workers': self.workers,
+            'batch_size': self.batch_sizes.to_dict(),
+            'latency_seconds': {name: h.to_dict() for name, h in self.latency.items()},
+        }
+
+    async def submit(self, op: int, body: bytes) -> Tuple[int, bytes]:
+        """把请求放入当前微批，返回 (status, body)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((op, body, future))
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self.pending = self.pending, []
+        if not batch: return
+        self.batch_sizes.observe(len(batch))
+        self.in_flight += len(batch)
+        task = asyncio.get_running_loop().run_in_executor(self.pool, _run_batch, [(op, body) for op, body, _ in batch])
+        task.add_done_callback(lambda t: self._complete(batch, t))
+
+    def _complete(self, batch: List, task: asyncio.Future) -> None:
+        self.in_flight -= len(batch)
+        if task.cancelled():
+            results = [(1, b"Request cancelled.")] * len(batch)
+        elif task.exception() is not None:  # 例如 worker 异常退出 (BrokenProcessPool)
+            results = [(1, f"Worker failed: {task.exception()!r}".encode())] * len(batch)
+        else:
+            results = task.result()
+        for (_, _, future), result in zip(batch, results):
+            if not future.done(): future.set_result(result)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks, lock = set(), asyncio.Lock()
+        try:
+            while True:
+                length = int.from_bytes(await reader.readexactly(4), 'big')
+                if not 5 <= length <= MAX_FRAME: break  # 帧长度非法，视为协议错误直接断开
+                frame = await reader.readexactly(length)
+                request_id, op = int.from_bytes(frame[:4], 'big'), frame[4]
+                task = asyncio.create_task(self._respond(writer, lock, request_id, op, frame[5:]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, lock: asyncio.Lock, request_id: int, op: int,
+                       body: bytes) -> None:
+        start = time.perf_counter()
+        self.requests += 1
+        if op == OP_STATS:
+            status, payload = 0, json.dumps(self.metrics()).encode()
+        elif op not in OP_NAMES:
+            status, payload = 1, f"Unknown op: {op}".encode()
+        elif self.queue_depth >= self.max_queue:
+            status, payload = 1, b"Server busy."
+        else:
+            status, payload = await self.submit(op, body)
+        if status: self.errors += 1
+        if op in OP_NAMES: self.latency[OP_NAMES[op]].observe(time.perf_counter() - start)
+        writer.write(_pack_frame(request_id, status, payload))
+        async with lock:  # 多个响应任务共用一个 writer，drain 串行进行
+            await writer.drain()
+
+# -- 客户端 --
+class SM2Client:
+    """SM2Server 的异步客户端；同一连接上可以并发发出多个请求，失败的请求抛出 ValueError"""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader, self._writer = reader, writer
+        self._next_id = 0
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._reader_task = asyncio.create_task(self._read_responses())
+
+    @classmethod
+    async def connect(cls, host: str = '127.0.0.1', port: int = None, path: str = None) -> 'SM2Client':
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._reader_task.cancel()
+
+    async def _read_responses(self) -> None:
+        try:
+            while True:
+                length = int.from_bytes(await self._reader.readexactly(4), 'big')
+                frame = await self._reader.readexactly(length)
+                future = self._waiters.pop(int.from_bytes(frame[:4], 'big'), None)
+                if future is not None and not future.done(): future.set_result((frame[4], frame[5:]))
+        except (asyncio.IncompleteReadError, ConnectionError) as exc:
+            for future in self._waiters.values():
+                if not future.done(): future.set_exception(ConnectionError(f"Connection closed: {exc!r}"))
+            self._waiters.clear()
+
+    async def _call(self, op: int, body: bytes = b'') -> bytes:
+        if len(body) + 5 > MAX_FRAME: raise ValueError("Request is too large.")
+        request_id, self._next_id = self._next_id, (self._next_id + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[request_id] = future
+        self._writer.write(_pack_frame(request_id, op, body))
+        await self._writer.drain()
+        status, payload = await future
+        if status: raise ValueError(payload.decode(errors='replace'))
+        return payload
+
+    @staticmethod
+    def _encode_public_key(public_key: Union[Point, bytes]) -> bytes:
+        return bytes(public_key) if isinstance(public_key, (bytes, bytearray, memoryview)) \
+            else encode_point(public_key, 'compressed')
+
+    async def sign(self, key_id: str, message: bytes, user_id: str = DEFAULT_USER_ID) -> Tuple[int, int]:
+        payload = await self._call(OP_SIGN, _pack_field(key_id.encode(), 1) + _pack_field(user_id.encode(), 2) + message)
+        return int.from_bytes(payload[:32], 'big'), int.from_bytes(payload[32:], 'big')
+
+    async def verify(self, public_key: Union[Point, bytes], message: bytes, signature: Tuple[int, int],
+                     user_id: str = DEFAULT_USER_ID) -> bool:
+        r, s = signature
+        if not (0 <= r < 1 << 256 and 0 <= s < 1 << 256): return False
+        body = _pack_field(self._encode_public_key(public_key), 1) + _pack_field(user_id.encode(), 2)
+        return await self._call(OP_VERIFY, body + r.to_bytes(32, 'big') + s.to_bytes(32, 'big') + message) == b'\x01'
+
+    async def encrypt(self, public_key: Union[Point, bytes], plaintext: bytes) -> bytes:
+        return await self._call(OP_ENCRYPT, _pack_field(self._encode_public_key(public_key), 1) + plaintext)
+
+    async def decrypt(self, key_id: str, ciphertext: bytes) -> bytes:
+        return await self._call(OP_DECRYPT, _pack_field(key_id.encode(), 1) + ciphertext)
+
+    async def stats(self) -> Dict:
+        return json.loads(await self._call(OP_STATS))
+
+
+def _parse_key(spec: str) -> Tuple[str, int]:
+    key_id, _, value = spec.partition('=')
+    if not key_id or not value: raise argparse.ArgumentTypeError("Expected NAME=HEX_PRIVATE_KEY.")
+    return key_id, int(value, 16)
+
+def _is_loopback(host: str) -> bool:
+    if host == 'localhost': return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+async def _main(args: argparse.Namespace) -> None:
+    keys = dict(args.key)
+    for key_id in args.generate:
+        keys[key_id] = SM2Key().private_key
+    server = SM2Server(keys, args.workers, args.batch_size, args.batch_window / 1000, args.max_queue)
+    await server.start(args.host, args.port, args.unix, args.allow_remote)
+    for key_id, d in keys.items():
+        print(f"密钥 {key_id}: 公钥 {SM2Key(private_key=d).public_key_bytes().hex()}")
+    print(f"监听 {args.unix or server.address}，worker 数 {server.workers}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="SM2 签名/加解密服务")
+    parser.add_argument('--unix', help="Unix socket 路径 (指定时忽略 --host/--port)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--allow-remote', action='store_true', help="允许 --host 为非回环地址 (服务无认证，须自行限制访问)")
+    parser.add_argument('--key', type=_parse_key, action='append', default=[], help="NAME=HEX 形式的私钥，可重复")
+    parser.add_argument('--generate', action='append', default=[], help="为 NAME 生成一个新私钥，可重复")
+    parser.add_argument('--workers', type=int, help="进程池大小 (默认 CPU 核数)")
+    parser.add_argument('--batch-size', type=int, default=64, help="微批的最大请求数")
+    parser.add_argument('--batch-window', type=float, default=2.0, help="微批的最长等待时间 (毫秒)")
+    parser.add_argument('--max-queue', type=int, default=10000, help="排队与执行中请求数的上限")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,354 @@
+import operator
+import os
+import queue
+import secrets
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Tuple, List, Iterable, Dict
+
+from . import field
+from .curve import A, B, N, Gx, Gy, Point, decode_point, inv, multi_scalar_mult, base_odd_multiples, \
+    precompute_odd_multiples, scalar_mult_base, use_bigint_backend
+from .field import P
+from .sm3 import SM3, iter_chunks, sm3_hash as get_hash
+
+# -- SM2 数字签名 (GB/T 32918.2) --
+# SignatureMixin 提供 SM2Key 的签名验签方法，另有公钥预计算缓存、签名随机数池、多进程批量验签与公钥恢复。
+DEFAULT_USER_ID = "1234567812345678"
+
+def compute_z(public_key: Point, user_id: str) -> bytes:
+    """Z = SM3(ENTL || ID || a || b || Gx || Gy || Px || Py)"""
+    user_id_bytes = user_id.encode('utf-8')
+    if len(user_id_bytes) > 0xFFFF // 8: raise ValueError("User ID is too long.")  # ENTL 为 16 位的比特长度
+    entl = (len(user_id_bytes) * 8).to_bytes(2, 'big')
+    data_to_hash = entl + user_id_bytes
+    data_to_hash += A.to_bytes(32, 'big') + B.to_bytes(32, 'big')
+    data_to_hash += Gx.to_bytes(32, 'big') + Gy.to_bytes(32, 'big')
+    data_to_hash += public_key[0].to_bytes(32, 'big')
+    data_to_hash += public_key[1].to_bytes(32, 'big')
+    return get_hash(data_to_hash)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+class PublicKeyCache:
+    """验签用的公钥预计算缓存 (线程安全 LRU)
+
+    以 (公钥, user_id) 为键，保存 Z 值和该公钥的 w-NAF 奇数倍表，
+    对热点公钥的重复验签可以跳过 SM3 计算 Z 与预计算表的构建。
+    """
+    def __init__(self, maxsize: int = 4096, width: int = 6):
+        self.maxsize = maxsize
+        self.width = width
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, public_key: Point, user_id: str) -> Tuple[bytes, List[Point]]:
+        """返回 (Z, 奇数倍表)，未命中时计算并放入缓存"""
+        key = (public_key, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        # 在锁外计算，避免一个未命中阻塞其它线程的命中
+        entry = (compute_z(public_key, user_id), precompute_odd_multiples(public_key, self.width))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+        return entry
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def export(self, keys: Iterable[Tuple[Point, str]]) -> Dict:
+        """导出已缓存的条目 (不计入命中统计)，用于预热其它进程的缓存"""
+        with self._lock:
+            return {key: self._entries[key] for key in keys if key in self._entries}
+
+    def update(self, entries: Dict) -> None:
+        """批量写入条目"""
+        with self._lock:
+            self._entries.update(entries)
+            self._evict()
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class NoncePool:
+    """签名随机数预计算池
+
+    后台线程用 CSPRNG (secrets) 生成 k 并预先计算 x1 = (k*G).x，放入容量为 depth 的队列；
+    sign 从队列取用，队列为空时回退为现场计算 (记为一次 underrun)。每个 (k, x1) 只会被取走一次。
+    进程 fork 后会丢弃继承来的队列并重新启动填充线程，避免父子进程复用同一个 k。
+    """
+    def __init__(self, depth: int = 64, start: bool = True):
+        self.depth = depth
+        self.refills = 0    # 后台线程放入队列的条目数
+        self.hits = 0       # sign 从队列取到的次数
+        self.underruns = 0  # 队列为空、回退到现场计算的次数
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._queue = queue.Queue(maxsize=depth)
+        self._thread = None
+        self._pid = os.getpid()
+        if start: self.start()
+
+    @staticmethod
+    def _new_nonce() -> Tuple[int, int]:
+        k = secrets.randbelow(N - 1) + 1
+        return k, scalar_mult_base(k)[0]
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive(): return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._fill, name="sm2-nonce-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None: self._thread.join()
+        self._thread = None
+
+    def _fill(self) -> None:
+        while not self._stop.is_set():
+            item = self._new_nonce()
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                except queue.Full:
+                    continue
+                with self._lock: self.refills += 1
+                break
+
+    def _check_fork(self) -> None:
+        if self._pid == os.getpid(): return
+        self._pid = os.getpid()
+        # 填充线程不会随 fork 复制，它持有的锁也可能停留在加锁状态，全部重建
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._thread = None
+        self.start()
+
+    def take(self) -> Tuple[int, int]:
+        """取出一个 (k, x1)"""
+        self._check_fork()
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            with self._lock: self.underruns += 1
+            return self._new_nonce()
+        with self._lock: self.hits += 1
+        return item
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'depth': self.depth, 'available': self._queue.qsize(), 'refills': self.refills,
+                    'hits': self.hits, 'underruns': self.underruns}
+
+RecoverableSignature = Tuple[int, int, int, int]  # (r, s, recovery_id, e)
+
+def _recover_point(e: int, signature: Tuple[int, int], recovery_id: int) -> Point:
+    """签名时 k = s + (r + s)·d，故 P = (r + s)^-1·(R - s·G)，其中 R = k·G 的 x 坐标为 (r - e) mod n + (recovery_id >> 1)·n，
+    y 的奇偶为 recovery_id & 1；两项用一次多标量乘法完成"""
+    r, s = signature
+    if not (1 <= r < N and 1 <= s < N and 0 <= recovery_id < 4): raise ValueError("Invalid signature.")
+    t = (r + s) % N
+    if t == 0: raise ValueError("Invalid signature.")
+    x1 = (r - e) % N + (recovery_id >> 1) * N
+    if x1 >= P: raise ValueError("Invalid recovery id.")
+    R = decode_point(bytes([2 | (recovery_id & 1)]) + x1.to_bytes(32, 'big'))
+    w = inv(t, N)
+    point = multi_scalar_mult([-s * w % N, w], [base_odd_multiples(), precompute_odd_multiples(R)])
+    if point is None: raise ValueError("Invalid signature.")
+    return point
+
+def recover_public_key(message: bytes, signature: RecoverableSignature, user_id: str = DEFAULT_USER_ID) -> Point:
+    """由消息与 sign_recoverable 返回的 (r, s, recovery_id, e) 恢复签名者公钥
+
+    Z 依赖公钥，无法在恢复前由消息算出 e，因此签名需携带 e。恢复出 P 后重新计算 SM3(Z_P || M)，
+    与 e 不符时抛出 ValueError: 只凭 (r, s, e) 对任意公钥都能构造出可恢复的 "签名"，e 必须与消息绑定。
+    """
+    r, s, recovery_id, e = signature
+    point = _recover_point(e, (r, s), recovery_id)
+    h = SM3(compute_z(point, user_id))
+    h.update(message)
+    if int.from_bytes(h.digest(), 'big') != e: raise ValueError("Signature does not match the message.")
+    return point
+
+class SignatureMixin:
+    """SM2Key 的签名与验签方法，要求实例具有 private_key / public_key 属性"""
+    # 所有实例共享的验签缓存，可通过 SM2Key.pubkey_cache.resize(...) 调整容量
+    pubkey_cache = PublicKeyCache()
+    nonce_pool = None
+
+    def _get_z(self, user_id: str) -> bytes:
+        return compute_z(self.public_key, user_id)
+
+    def _digest(self, z: bytes, chunks: Iterable) -> int:
+        """e = SM3(Z || M)，M 按块送入增量哈希，不拼接 Z 与消息"""
+        h = SM3(z)
+        for chunk in chunks:
+            h.update(chunk)
+        return int.from_bytes(h.digest(), 'big')
+
+    def _sign_digest(self, e: int) -> Tuple[int, int]:
+        if not self.private_key: raise ValueError("Private key is not available for signing.")
+        while True:
+            if self.nonce_pool is not None:
+                k, x1 = self.nonce_pool.take()
+            else:
+                k = secrets.randbelow(N - 1) + 1
+                x1, y1 = scalar_mult_base(k)
+            r = (e + x1) % N
+            if r == 0 or r + k == N: continue
+            d = self.private_key
+            s = (inv(1 + d, N) * (k - r * d)) % N
+            if s != 0: break
+        return r, s
+
+    def _verify_digest(self, e: int, signature: Tuple[int, int], table: List[Point]) -> bool:
+        r, s = signature
+        t = (r + s) % N
+        if t == 0: return False
+        # s*G + t*P 一次完成，两项共享倍点
+        point = multi_scalar_mult([s, t], [base_odd_multiples(), table])
+        if point is None: return False
+        R = (e + point[0]) % N
+        return R == r
+
+    def sign(self, message: bytes, user_id: str = DEFAULT_USER_ID) -> Tuple[int, int]:
+        return self._sign_digest(self._digest(self._get_z(user_id), [message]))
+
+    def verify(self, message: bytes, signature: Tuple[int, int], user_id: str = DEFAULT_USER_ID) -> bool:
+        r, s = signature
+        if not (1 <= r < N and 1 <= s < N): return False
+        z, table = self.pubkey_cache.get(self.public_key, user_id)
+        return self._verify_digest(self._digest(z, [message]), signature, table)
+
+    def recovery_id(self, e: int, signature: Tuple[int, int]) -> int:
+        """求使 R 恢复出本公钥的 recovery_id (签名随机数池只保存 x1，因此逐个尝试，最多四次)"""
+        for recovery_id in range(4):
+            try:
+                if _recover_point(e, signature, recovery_id) == self.public_key: return recovery_id
+            except ValueError:
+                continue
+        raise ValueError("Signature does not match the public key.")
+
+    def sign_recoverable(self, message: bytes, user_id: str = DEFAULT_USER_ID) -> RecoverableSignature:
+        """签名并附带 recovery_id 与 e，返回 (r, s, recovery_id, e)，见 recover_public_key"""
+        e = self._digest(self._get_z(user_id), [message])
+        r, s = self._sign_digest(e)
+        return r, s, self.recovery_id(e, (r, s)), e
+
+    @classmethod
+    def recover(cls, message: bytes, signature: RecoverableSignature, user_id: str = DEFAULT_USER_ID):
+        """由消息与 (r, s, recovery_id, e) 恢复出只含公钥的密钥对象，见 recover_public_key"""
+        return cls(public_key=recover_public_key(message, signature, user_id))
+
+    def sign_stream(self, source, user_id: str = DEFAULT_USER_ID, chunk_size: int = 1 << 20) -> Tuple[int, int]:
+        """对文件对象、字节块迭代器或 mmap/memoryview 中的消息签名，内存占用与消息大小无关"""
+        if not self.private_key: raise ValueError("Private key is not available for signing.")
+        return self._sign_digest(self._digest(self._get_z(user_id), iter_chunks(source, chunk_size)))
+
+    def verify_stream(self, source, signature: Tuple[int, int], user_id: str = DEFAULT_USER_ID,
+                      chunk_size: int = 1 << 20) -> bool:
+        """sign_stream 对应的流式验签"""
+        r, s = signature
+        if not (1 <= r < N and 1 <= s < N): return False
+        z, table = self.pubkey_cache.get(self.public_key, user_id)
+        return self._verify_digest(self._digest(z, iter_chunks(source, chunk_size)), signature, table)
+
+# -- 多进程批量验签 --
+VerifyItem = Tuple[Point, bytes, Tuple[int, int], str]
+
+def _init_verify_worker(bigint_backend: str, cache_entries: Dict) -> None:
+    """进程池初始化: 沿用父进程的大整数后端，并安装父进程已缓存的公钥条目，worker 不再重建"""
+    if bigint_backend != field.BIGINT_BACKEND: use_bigint_backend(bigint_backend)
+    SignatureMixin.pubkey_cache.update(cache_entries)
+
+def _verify_chunk(chunk: List[VerifyItem]) -> List[bool]:
+    from .key import SM2Key  # key 依赖本模块，在函数内导入以避免循环导入
+    results = []
+    for public_key, message, signature, user_id in chunk:
+        try:
+            results.append(SM2Key(public_key=public_key).verify(message, signature, user_id))
+        except (ValueError, TypeError):
+            results.append(False)  # 格式错误的条目视为验签失败，不影响整批
+    return results
+
+def verify_batch(items: Iterable[Tuple], max_workers: int = None, chunksize: int = 64) -> List[bool]:
+    """批量验签，返回与输入顺序一致的布尔列表
+
+    items 中每项为 (public_key, message, signature, user_id)，user_id 可省略，public_key 可为字节编码。
+    条目按公钥分组后切块分发到进程池，使每个 worker 的公钥缓存尽量命中；
+    父进程中已缓存的公钥条目通过进程池初始化函数一次性传给 worker。
+    """
+    items = [tuple(item) if len(item) == 4 else (*item, DEFAULT_USER_ID) for item in items]
+    # 公钥先规整为整数二元组 (字节编码经 decode_point 解码，解压有 LRU 缓存)，以便排序分组；
+    # 无法规整的公钥或非 str 的 user_id 直接判为失败，不影响整批
+    valid = []
+    for i, (public_key, *rest) in enumerate(items):
+        try:
+            if isinstance(public_key, (bytes, bytearray, memoryview)): public_key = decode_point(public_key)
+            public_key = tuple(map(operator.index, public_key))
+        except (ValueError, TypeError):
+            continue
+        if len(public_key) != 2 or not isinstance(rest[2], str): continue
+        items[i] = (public_key, *rest)
+        valid.append(i)
+    results = [False] * len(items)
+    if max_workers == 1 or len(valid) <= chunksize:
+        for i, ok in zip(valid, _verify_chunk([items[i] for i in valid])):
+            results[i] = ok
+        return results
+    order = sorted(valid, key=lambda i: items[i][0])
+    chunks = [order[i:i + chunksize] for i in range(0, len(order), chunksize)]
+    cache_entries = SignatureMixin.pubkey_cache.export({(items[i][0], items[i][3]) for i in valid})
+    from concurrent.futures import ProcessPoolExecutor  # 只在批量验签时导入 (导入开销约十几毫秒)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_verify_worker,
+                             initargs=(field.BIGINT_BACKEND, cache_entries)) as pool:
+        chunk_results = pool.map(_verify_chunk, [[items[i] for i in chunk] for chunk in chunks])
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            for i, ok in zip(chunk, chunk_result):
+                results[i] = ok
+    return results
+
+# -- 多进程批量恢复公钥 --
+RecoverItem = Tuple[bytes, RecoverableSignature, str]
+
+def _recover_chunk(chunk: List[RecoverItem]) -> List[Point]:
+    results = []
+    for message, signature, user_id in chunk:
+        try:
+            results.append(recover_public_key(message, signature, user_id))
+        except (ValueError, TypeError, OverflowError):
+            results.append(None)
+    return results
+
+def recover_batch(items: Iterable[Tuple], max_workers: int = None, chunksize: int = 64) -> List[Point]:
+    """批量恢复公钥，items 中每项为 (message, (r, s, recovery_id, e), user_id)，user_id 可省略；
+    返回与输入顺序一致的公钥列表，无效条目或 e 与消息不符的条目为 None"""
+    items = [tuple(item) if len(item) == 3 else (*item, DEFAULT_USER_ID) for item in items]
+    if max_workers == 1 or len(items) <= chunksize: return _recover_chunk(items)
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_verify_worker,
+                             initargs=(field.BIGINT_BACKEND, {})) as pool:
+        return [point for chunk_result in pool.map(_recover_chunk, chunks) for point in chunk_result]
@@ -0,0 +1,213 @@
+import os
+import struct
+from typing import Callable, Dict, Iterable, List
+
+# -- SM3 杂凑算法 (GB/T 32905-2016) --
+# 压缩函数由可插拔的后端提供:
+#   python  优化后的纯 Python 实现 (始终可用)
+#   simd    ctypes 加载 PROJECT4/SM3_SIMD.cpp 编译出的共享库
+#   gmssl   gmssl.sm3.sm3_cf
+# 默认按 simd > python > gmssl 的顺序选第一个可用的后端 (gmssl 同为纯 Python，且逐字节处理，比 python 后端慢)；
+# 环境变量 SM3_BACKEND 或 set_backend() 可以强制指定。后端在第一次使用时才加载。
+
+IV = [0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+      0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E]
+_MASK = 0xFFFFFFFF
+# T_j <<< (j mod 32) 与消息无关，提前算好
+_T_ROT = [((t << (j % 32)) | (t >> (32 - j % 32))) & _MASK
+          for j, t in ((j, 0x79CC4519 if j < 16 else 0x7A879D8A) for j in range(64))]
+_unpack_block = struct.Struct('>16I').unpack_from
+
+def _compress_python(v: List[int], data) -> List[int]:
+    """对 data 中的若干个完整分组依次压缩
+
+    轮函数全部内联: 不调用 _rotate_left/_ff/_gg，前 16 轮与后 48 轮分成两个循环避免逐轮分支。
+    """
+    for offset in range(0, len(data), 64):
+        w = list(_unpack_block(data, offset))
+        for j in range(16, 68):
+            x = w[j-16] ^ w[j-9] ^ (((w[j-3] << 15) | (w[j-3] >> 17)) & _MASK)
+            x ^= (((x << 15) | (x >> 17)) ^ ((x << 23) | (x >> 9))) & _MASK
+            y = w[j-13]
+            w.append(x ^ (((y << 7) | (y >> 25)) & _MASK) ^ w[j-6])
+        a, b, c, d, e, f, g, h = v
+        for j in range(16):
+            a12 = ((a << 12) | (a >> 20)) & _MASK
+            ss1 = (a12 + e + _T_ROT[j]) & _MASK
+            ss1 = ((ss1 << 7) | (ss1 >> 25)) & _MASK
+            tt1 = ((a ^ b ^ c) + d + (ss1 ^ a12) + (w[j] ^ w[j+4])) & _MASK
+            tt2 = ((e ^ f ^ g) + h + ss1 + w[j]) & _MASK
+            d = c; c = ((b << 9) | (b >> 23)) & _MASK; b = a; a = tt1
+            h = g; g = ((f << 19) | (f >> 13)) & _MASK; f = e
+            e = tt2 ^ ((((tt2 << 9) | (tt2 >> 23)) ^ ((tt2 << 17) | (tt2 >> 15))) & _MASK)
+        for j in range(16, 64):
+            a12 = ((a << 12) | (a >> 20)) & _MASK
+            ss1 = (a12 + e + _T_ROT[j]) & _MASK
+            ss1 = ((ss1 << 7) | (ss1 >> 25)) & _MASK
+            tt1 = (((a & b) | (a & c) | (b & c)) + d + (ss1 ^ a12) + (w[j] ^ w[j+4])) & _MASK
+            tt2 = (((e & f) | (~e & g)) + h + ss1 + w[j]) & _MASK
+            d = c; c = ((b << 9) | (b >> 23)) & _MASK; b = a; a = tt1
+            h = g; g = ((f << 19) | (f >> 13)) & _MASK; f = e
+            e = tt2 ^ ((((tt2 << 9) | (tt2 >> 23)) ^ ((tt2 << 17) | (tt2 >> 15))) & _MASK)
+        v = [v[0] ^ a, v[1] ^ b, v[2] ^ c, v[3] ^ d, v[4] ^ e, v[5] ^ f, v[6] ^ g, v[7] ^ h]
+    return v
+
+def _load_python() -> Callable:
+    return _compress_python
+
+def _load_gmssl() -> Callable:
+    from gmssl.sm3 import sm3_cf
+
+    def compress(v: List[int], data) -> List[int]:
+        for offset in range(0, len(data), 64):
+            v = sm3_cf(v, list(data[offset:offset+64]))
+        return v
+    return compress
+
+def _load_simd() -> Callable:
+    import ctypes
+    path = os.environ.get('SM3_SIMD_LIB') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', '..', 'PROJECT4', 'libsm3simd.so')
+    lib = ctypes.CDLL(path)
+    fn = lib.sm3_compress_blocks
+    fn.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.c_char_p, ctypes.c_size_t]
+    fn.restype = None
+
+    def compress(v: List[int], data) -> List[int]:
+        state = (ctypes.c_uint32 * 8)(*v)
+        fn(state, bytes(data), len(data) // 64)
+        return list(state)
+    return compress
+
+# 名称 -> 加载函数；加载函数在依赖缺失时抛出 ImportError / OSError
+_BACKENDS: Dict[str, Callable[[], Callable]] = {}
+_PRIORITY: List[str] = []
+_backend_name = None
+_compress = None
+
+def register_backend(name: str, loader: Callable[[], Callable], priority: int = None) -> None:
+    """注册后端；priority 为其在自动选择顺序中的位置 (默认排在最后)"""
+    _BACKENDS[name] = loader
+    if name in _PRIORITY: _PRIORITY.remove(name)
+    _PRIORITY.insert(len(_PRIORITY) if priority is None else priority, name)
+
+def available_backends() -> List[str]:
+    """按自动选择顺序列出当前环境下可以加载的后端"""
+    names = []
+    for name in _PRIORITY:
+        try:
+            _BACKENDS[name]()
+        except (ImportError, OSError, AttributeError):
+            continue
+        names.append(name)
+    return names
+
+def set_backend(name: str = None) -> str:
+    """切换后端；name 为 None 时按 SM3_BACKEND 环境变量或默认顺序自动选择"""
+    global _backend_name, _compress
+    name = name or os.environ.get('SM3_BACKEND')
+    if name:
+        if name not in _BACKENDS: raise ValueError(f"Unknown SM3 backend: {name}")
+        candidates = [name]
+    else:
+        candidates = _PRIORITY
+    for candidate in candidates:
+        try:
+            compress = _BACKENDS[candidate]()
+        except (ImportError, OSError, AttributeError):
+            if name: raise
+            continue
+        _backend_name, _compress = candidate, compress
+        return candidate
+    raise RuntimeError("No SM3 backend available.")
+
+def get_backend() -> str:
+    if _compress is None: set_backend()
+    return _backend_name
+
+def compress_blocks(v: List[int], data) -> List[int]:
+    """用当前后端压缩 data 中的完整分组 (len(data) 须为 64 的倍数)"""
+    if _compress is None: set_backend()
+    return _compress(v, data)
+
+register_backend('simd', _load_simd)
+register_backend('python', _load_python)
+register_backend('gmssl', _load_gmssl)
+
+
+class SM3:
+    """增量 SM3: 可多次 update()，内部只保留不足一个分组 (64 字节) 的缓冲
+
+    update() 接受 bytes / bytearray / memoryview / mmap 等任意字节缓冲，不会复制整条消息。
+    """
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data=b''):
+        self._v = list(IV)
+        self._buf = b''
+        self._length = 0
+        if data: self.update(data)
+
+    def update(self, data) -> None:
+        data = memoryview(data).cast('B')
+        self._length += len(data)
+        offset = 0
+        if self._buf:
+            offset = 64 - len(self._buf)
+            if len(data) < offset:
+                self._buf += bytes(data)
+                return
+            self._v = compress_blocks(self._v, self._buf + bytes(data[:offset]))
+        end = offset + (len(data) - offset) // 64 * 64
+        if end > offset:
+            self._v = compress_blocks(self._v, data[offset:end])
+        self._buf = bytes(data[end:])
+
+    def copy(self) -> 'SM3':
+        other = SM3.__new__(SM3)
+        other._v, other._buf, other._length = list(self._v), self._buf, self._length
+        return other
+
+    def digest(self) -> bytes:
+        length = self._length
+        tail = self._buf + b'\x80' + b'\x00' * ((55 - length) % 64) + (length * 8).to_bytes(8, 'big')
+        return b''.join(x.to_bytes(4, 'big') for x in compress_blocks(self._v, tail))
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+def sm3_hash(data: bytes) -> bytes:
+    return SM3(data).digest()
+
+def iter_chunks(source, chunk_size: int = 1 << 20) -> Iterable:
+    """把消息来源统一为字节块迭代器
+
+    source 可以是带 read() 的文件对象 (按 chunk_size 读取)、bytes/memoryview/mmap 等字节缓冲
+    (以 memoryview 整体送入，不复制)，或者产生字节块的可迭代对象。
+    """
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk: return
+            yield chunk
+    try:
+        view = memoryview(source)
+    except TypeError:
+        yield from source
+    else:
+        yield view
+
+
+if __name__ == '__main__':
+    import time
+
+    assert sm3_hash(b'abc').hex() == '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'
+    message = os.urandom(64 * 1024)
+    for name in available_backends():
+        set_backend(name)
+        assert sm3_hash(b'abc').hex() == '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'
+        start = time.time()
+        sm3_hash(message)
+        elapsed = time.time() - start
+        print(f"{name:<8}{len(message) / elapsed / 1e6:>10.2f} MB/s")
@@ -0,0 +1,337 @@
+from typing import List, Tuple, Union
+
+from . import field
+
+# -- 参数化的短 Weierstrass 曲线 y^2 = x^3 + ax + b 标量乘法引擎 --
+# Jacobian 坐标、w-NAF、批量求逆转仿射的奇数倍表、交错多标量乘法；曲线参数保存在 Curve 实例中，
+# 可用于 SM2、secp256k1 等任意素域曲线 (要求 p ≡ 3 mod 4 以便开方解压)。
+# 倍点按 a 的取值选用公式: a = 0 (secp256k1) 时 3X^2，a = -3 (SM2) 时 3(X - Z^2)(X + Z^2)。
+# 带 GLV 参数的曲线 (secp256k1) 利用自同态 φ(x, y) = (βx, y) = λ·(x, y)，把 k 拆成两个约 128 位的
+# k1 + k2·λ，k·P = k1·P + k2·φ(P)，两项共享倍点，倍点次数约减半；φ(P) 的奇数倍表由 P 的表逐点乘 β 得到。
+# curve.py 中 SM2 的模块级函数都委托给 SM2_CURVE，只额外提供 G 的固定基表、预热与大整数后端切换
+# (切换后端时 SM2_CURVE.p 随之换成 gmpy2.mpz)。热循环中的乘法直接内联 % p，省去调用辅助函数的开销。
+Point = Tuple[int, int]
+JacobianPoint = Tuple[int, int, int]
+
+class Curve:
+    """素域上的短 Weierstrass 曲线；glv 为 (beta, lam, basis)，basis 为格基 ((a1, b1), (a2, b2))"""
+    def __init__(self, name: str, p: int, a: int, b: int, n: int, gx: int, gy: int, glv: Tuple = None):
+        self.name, self.p, self.a, self.b, self.n = name, p, a % p, b, n
+        self.G = (gx, gy)
+        self.glv = glv
+        self._a_is_minus3 = self.a == p - 3
+        self._base_tables = {}
+
+    def __repr__(self) -> str:
+        return f"Curve({self.name!r})"
+
+    # -- 仿射运算 --
+    def is_on_curve(self, pt: Point) -> bool:
+        if pt is None: return True
+        x, y = pt
+        p = self.p
+        return 0 <= x < p and 0 <= y < p and (y * y - (x * x + self.a) * x - self.b) % p == 0
+
+    def point_neg(self, pt: Point) -> Union[Point, None]:
+        if pt is None: return None
+        return (pt[0], int(-pt[1] % self.p))
+
+    def point_add(self, p1: Point, p2: Point) -> Union[Point, None]:
+        if p1 is None: return p2
+        if p2 is None: return p1
+        p = self.p
+        x1, y1 = p1; x2, y2 = p2
+        if x1 == x2 and (y1 + y2) % p == 0: return None
+        if x1 == x2: m = (3 * x1 * x1 + self.a) * field.inv_mod(2 * y1, p) % p
+        else: m = (y2 - y1) * field.inv_mod(x2 - x1, p) % p
+        x3 = (m * m - x1 - x2) % p
+        return (int(x3), int((m * (x1 - x3) - y1) % p))
+
+    def encode_point(self, pt: Point, compressed: bool = True) -> bytes:
+        size = (self.p.bit_length() + 7) // 8
+        x, y = (int(c) for c in pt)
+        if compressed: return bytes([2 | (y & 1)]) + x.to_bytes(size, 'big')
+        return b'\x04' + x.to_bytes(size, 'big') + y.to_bytes(size, 'big')
+
+    def decode_point(self, data) -> Point:
+        """SEC1 压缩 (02/03 || x) 或非压缩 (04 || x || y) 编码，并检查点在曲线上"""
+        data, size, p = bytes(data), (self.p.bit_length() + 7) // 8, self.p
+        if len(data) == size + 1 and data[0] in (2, 3):
+            x = int.from_bytes(data[1:], 'big')
+            if x >= p: raise ValueError("Point is not on the curve.")
+            rhs = ((x * x + self.a) * x + self.b) % p
+            y = int(field.powmod(rhs, (p + 1) // 4, p))
+            if y * y % p != rhs: raise ValueError("Point is not on the curve.")
+            if y & 1 != data[0] & 1: y = p - y
+            pt = (x, y)
+        elif len(data) == 2 * size + 1 and data[0] == 4:
+            pt = (int.from_bytes(data[1:size + 1], 'big'), int.from_bytes(data[size + 1:], 'big'))
+        else:
+            raise ValueError("Invalid point encoding.")
+        if not self.is_on_curve(pt): raise ValueError("Point is not on the curve.")
+        return pt
+
+    # -- Jacobian 坐标 --
+    # 射影点 (X, Y, Z) 对应仿射点 (X/Z^2, Y/Z^3)，无穷远点仍用 None 表示；加法与倍点均不需要求逆。
+    # 坐标在 to_jacobian 中转为后端的整数类型 (gmpy2.mpz 或 int)，预计算表也保存该类型，对外返回的仿射点再转回 int。
+    def to_jacobian(self, pt: Point) -> Union[JacobianPoint, None]:
+        if pt is None: return None
+        mpz = field.mpz
+        return (mpz(pt[0]), mpz(pt[1]), mpz(1))
+
+    def from_jacobian(self, pt: JacobianPoint) -> Union[Point, None]:
+        """射影坐标转回仿射坐标 (一次求逆)"""
+        if pt is None: return None
+        p = self.p
+        x, y, z = pt
+        z_inv = field.inv_mod(z, p)
+        z_inv2 = z_inv * z_inv % p
+        return (int(x * z_inv2 % p), int(y * z_inv2 * z_inv % p))
+
+    def batch_from_jacobian(self, points: List[JacobianPoint]) -> List[Union[Point, None]]:
+        """批量转回仿射坐标，所有点共用一次求逆 (Montgomery 技巧)；坐标保持后端类型，供预计算表使用"""
+        p = self.p
+        z_invs = iter(field.batch_inv_mod([pt[2] for pt in points if pt is not None], p))
+        result = []
+        for pt in points:
+            if pt is None:
+                result.append(None)
+                continue
+            z_inv = next(z_invs)
+            z_inv2 = z_inv * z_inv % p
+            result.append((pt[0] * z_inv2 % p, pt[1] * z_inv2 * z_inv % p))
+        return result
+
+    def jacobian_neg(self, pt: JacobianPoint) -> Union[JacobianPoint, None]:
+        if pt is None: return None
+        return (pt[0], -pt[1] % self.p, pt[2])
+
+    def jacobian_double(self, pt: JacobianPoint) -> Union[JacobianPoint, None]:
+        if pt is None: return None
+        p = self.p
+        x1, y1, z1 = pt
+        if y1 == 0: return None
+        delta = z1 * z1 % p
+        gamma = y1 * y1 % p
+        beta = x1 * gamma % p
+        if self._a_is_minus3: alpha = 3 * (x1 - delta) * (x1 + delta) % p
+        elif self.a == 0: alpha = 3 * x1 * x1 % p
+        else: alpha = (3 * x1 * x1 + self.a * delta * delta) % p
+        x3 = (alpha * alpha - 8 * beta) % p
+        z3 = ((y1 + z1) * (y1 + z1) - gamma - delta) % p
+        y3 = (alpha * (4 * beta - x3) - 8 * gamma * gamma) % p
+        return (x3, y3, z3)
+
+    def jacobian_add(self, p1: JacobianPoint, p2: JacobianPoint) -> Union[JacobianPoint, None]:
+        """Jacobian 一般加法"""
+        if p1 is None: return p2
+        if p2 is None: return p1
+        p = self.p
+        x1, y1, z1 = p1; x2, y2, z2 = p2
+        z1z1 = z1 * z1 % p; z2z2 = z2 * z2 % p
+        u1 = x1 * z2z2 % p; u2 = x2 * z1z1 % p
+        s1 = y1 * z2 * z2z2 % p; s2 = y2 * z1 * z1z1 % p
+        h = (u2 - u1) % p; r = (s2 - s1) % p
+        if h == 0:
+            return self.jacobian_double(p1) if r == 0 else None
+        hh = h * h % p; hhh = h * hh % p; v = u1 * hh % p
+        x3 = (r * r - hhh - 2 * v) % p
+        y3 = (r * (v - x3) - s1 * hhh) % p
+        return (x3, y3, z1 * z2 * h % p)
+
+    def jacobian_add_affine(self, p1: JacobianPoint, p2: Point) -> Union[JacobianPoint, None]:
+        """混合加法: p1 为 Jacobian 点，p2 为仿射点 (Z2 = 1)，省去 Z2 相关的乘法"""
+        if p2 is None: return p1
+        if p1 is None: return self.to_jacobian(p2)
+        p = self.p
+        x1, y1, z1 = p1; x2, y2 = p2
+        z1z1 = z1 * z1 % p
+        u2 = x2 * z1z1 % p; s2 = y2 * z1 * z1z1 % p
+        h = (u2 - x1) % p; r = (s2 - y1) % p
+        if h == 0:
+            return self.jacobian_double(p1) if r == 0 else None
+        hh = h * h % p; hhh = h * hh % p; v = x1 * hh % p
+        x3 = (r * r - hhh - 2 * v) % p
+        y3 = (r * (v - x3) - y1 * hhh) % p
+        return (x3, y3, z1 * h % p)
+
+    # -- 标量乘法 --
+    def scalar_mult_double_and_add(self, k: int, pt: Union[Point, None]) -> Union[Point, None]:
+        """仿射坐标的 Double-and-add，作为性能对比与测试的参照实现"""
+        k %= self.n
+        if pt is None or k == 0: return None
+        result, addend = None, pt
+        while k:
+            if k & 1: result = self.point_add(result, addend)
+            addend = self.point_add(addend, addend)
+            k >>= 1
+        return result
+
+    @staticmethod
+    def naf(k: int, width: int) -> List[int]:
+        """k >= 0 的 w-NAF 表示 (低位在前)"""
+        digits, full, half = [], 1 << width, 1 << (width - 1)
+        while k > 0:
+            if k & 1:
+                z = k % full
+                if z >= half: z -= full
+                digits.append(z)
+                k -= z
+            else: digits.append(0)
+            k >>= 1
+        return digits
+
+    def precompute_odd_multiples(self, pt: Point, width: int = 5) -> List[Point]:
+        """[1P, 3P, ..., (2^(w-1)-1)P]，在 Jacobian 下构建后批量转为仿射"""
+        pt_jac = self.to_jacobian(pt)
+        twice = self.jacobian_double(pt_jac)
+        table = [pt_jac]
+        for _ in range(1, 1 << (width - 2)):
+            table.append(self.jacobian_add(table[-1], twice))
+        return self.batch_from_jacobian(table)
+
+    def endomorphism_table(self, table: List[Point]) -> List[Point]:
+        """由 P 的奇数倍表得到 φ(P) 的奇数倍表: (x, y) -> (βx, y)，不需要点运算"""
+        beta, p = self.glv[0], self.p
+        return [(x * beta % p, y) for x, y in table]
+
+    def decompose(self, k: int) -> Tuple[int, int]:
+        """GLV 分解 k ≡ k1 + k2·λ (mod n)，|k1|、|k2| 约为 sqrt(n)"""
+        n = self.n
+        (a1, b1), (a2, b2) = self.glv[2]
+        c1 = (b2 * k + n // 2) // n
+        c2 = (-b1 * k + n // 2) // n
+        return k - c1 * a1 - c2 * a2, -c1 * b1 - c2 * b2
+
+    def multi_scalar_mult_tables(self, scalars: List[int], tables: List[List[Point]]) -> Union[Point, None]:
+        """交错 w-NAF 多标量乘法 Σ k_i·P_i，所有项共享同一串倍点 (Straus/Shamir 技巧)
+
+        tables[i] 为 P_i 的奇数倍表 (见 precompute_odd_multiples)，窗口宽度由表长决定；k_i 可为负。
+        """
+        return self.from_jacobian(self.multi_scalar_mult_jacobian(scalars, tables))
+
+    def multi_scalar_mult_jacobian(self, scalars: List[int], tables: List[List]) -> Union[JacobianPoint, None]:
+        """同上，结果保留为 Jacobian 点；表项可以是仿射点 (使用混合加法)，也可以是 Jacobian 点"""
+        p = self.p
+        double, add, add_affine = self.jacobian_double, self.jacobian_add, self.jacobian_add_affine
+        terms = []
+        for k, table in zip(scalars, tables):
+            if k < 0: k, table = -k, [self.jacobian_neg(q) if len(q) == 3 else (q[0], p - q[1]) for q in table]
+            if k: terms.append((self.naf(k, len(table).bit_length() + 1), table))
+        if not terms: return None
+        result = None
+        for i in range(max(len(digits) for digits, _ in terms) - 1, -1, -1):
+            if result is not None: result = double(result)
+            for digits, table in terms:
+                if i >= len(digits) or digits[i] == 0: continue
+                d = digits[i]
+                q = table[d >> 1] if d > 0 else table[-d >> 1]
+                if len(q) == 2:
+                    result = add_affine(result, q if d > 0 else (q[0], p - q[1]))
+                else:
+                    result = add(result, q if d > 0 else self.jacobian_neg(q))
+        return result
+
+    def _split_terms(self, scalars: List[int], tables: List[List[Point]]) -> Tuple[List[int], List[List[Point]]]:
+        """GLV 曲线上把每一项 k·P 拆成 k1·P + k2·φ(P)"""
+        if not self.glv: return [k % self.n for k in scalars], tables
+        split_scalars, split_tables = [], []
+        for k, table in zip(scalars, tables):
+            k1, k2 = self.decompose(k % self.n)
+            split_scalars += [k1, k2]
+            split_tables += [table, self.endomorphism_table(table)]
+        return split_scalars, split_tables
+
+    def multi_scalar_mult(self, scalars: List[int], points: List[Point], width: int = 5) -> Union[Point, None]:
+        """Σ k_i·P_i；G 使用缓存的预计算表，GLV 曲线上自动拆分标量"""
+        tables = [self.base_table() if pt == self.G else self.precompute_odd_multiples(pt, width) for pt in points]
+        return self.multi_scalar_mult_tables(*self._split_terms(scalars, tables))
+
+    def scalar_mult(self, k: int, pt: Union[Point, None], width: int = 5) -> Union[Point, None]:
+        if pt is None or k % self.n == 0: return None
+        return self.multi_scalar_mult([k], [pt], width)
+
+    def scalar_mult_base(self, k: int) -> Union[Point, None]:
+        return self.scalar_mult(k, self.G)
+
+    def base_table(self, width: int = 7) -> List[Point]:
+        """G 的奇数倍表 (按窗口宽度缓存)"""
+        table = self._base_tables.get(width)
+        if table is None: table = self._base_tables[width] = self.precompute_odd_multiples(self.G, width)
+        return table
+
+    def ecdsa_verify(self, public_key: Point, z: int, signature: Tuple[int, int]) -> bool:
+        """ECDSA 验签: z 为按 n 的位长截取后的摘要整数；u1·G + u2·Q 一次多标量乘法完成"""
+        r, s = signature
+        n = self.n
+        if not (1 <= r < n and 1 <= s < n): return False
+        w = int(field.invert(s, n))
+        point = self.multi_scalar_mult([z * w % n, r * w % n], [self.G, public_key])
+        return point is not None and point[0] % n == r
+
+    def ecdsa_recover(self, z: int, signature: Tuple[int, int], recovery_id: int) -> Point:
+        """由签名恢复 ECDSA 公钥: R 的 x 坐标为 r + (recovery_id >> 1)·n，y 的奇偶为 recovery_id & 1，
+        Q = r^-1·(s·R - z·G)，一次多标量乘法完成"""
+        r, s = signature
+        n = self.n
+        if not (1 <= r < n and 1 <= s < n and 0 <= recovery_id < 4): raise ValueError("Invalid signature.")
+        x = r + (recovery_id >> 1) * n
+        if x >= self.p: raise ValueError("Invalid recovery id.")
+        R = self.decode_point(bytes([2 | (recovery_id & 1)]) + x.to_bytes((self.p.bit_length() + 7) // 8, 'big'))
+        w = int(field.invert(r, n))
+        point = self.multi_scalar_mult([-z * w % n, s * w % n], [self.G, R])
+        if point is None: raise ValueError("Invalid signature.")
+        return point
+
+    def ecdsa_recovery_id(self, public_key: Point, z: int, signature: Tuple[int, int]) -> int:
+        """求使 ecdsa_recover 得到 public_key 的 recovery_id (签名方调用，最多尝试四次)"""
+        for recovery_id in range(4):
+            try:
+                if self.ecdsa_recover(z, signature, recovery_id) == tuple(public_key): return recovery_id
+            except ValueError:
+                continue
+        raise ValueError("Signature does not match the public key.")
+
+
+SM2_CURVE = Curve(
+    'sm2',
+    p=0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFF,
+    a=0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFC,
+    b=0x28E9FA9E_9D9F5E34_4D5A9E4B_CF6509A7_F39789F5_15AB8F92_DDBCBD41_4D940E93,
+    n=0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_7203DF6B_21C6052B_53BBF409_39D54123,
+    gx=0x32C4AE2C_1F198119_5F990446_6A39C994_8FE30BBF_F2660BE1_715A4589_334C74C7,
+    gy=0xBC3736A2_F4F6779C_59BDCEE3_6B692153_D0A9877C_C62A4740_02DF32E5_2139F0A0,
+)
+
+# secp256k1 (SEC 2)，GLV 参数: β^3 ≡ 1 (mod p)，λ^3 ≡ 1 (mod n)，λ·(x, y) = (βx, y)
+SECP256K1 = Curve(
+    'secp256k1',
+    p=0xFFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFE_FFFFFC2F,
+    a=0,
+    b=7,
+    n=0xFFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFE_BAAEDCE6_AF48A03B_BFD25E8C_D0364141,
+    gx=0x79BE667E_F9DCBBAC_55A06295_CE870B07_029BFCDB_2DCE28D9_59F2815B_16F81798,
+    gy=0x483ADA77_26A3C465_5DA4FBFC_0E1108A8_FD17B448_A6855419_9C47D08F_FB10D4B8,
+    glv=(0x7AE96A2B_657C0710_6E64479E_AC3434E9_9CF04975_12F58995_C1396C28_719501EE,
+         0x5363AD4C_C05C30E0_A5261C02_8812645A_122E22EA_20816678_DF02967C_1B23BD72,
+         ((0x3086D221_A7D46BCD_E86C90E4_9284EB15, -0xE4437ED6_010E8828_6F547FA9_0ABFE4C3),
+          (0x114CA50F_7A8E2F3F_657C1108_D9D44CFD8, 0x3086D221_A7D46BCD_E86C90E4_9284EB15))),
+)
+
+
+if __name__ == '__main__':
+    import random
+    import timeit
+
+    rng = random.Random(1)
+    for curve in (SM2_CURVE, SECP256K1):
+        k = rng.randrange(1, curve.n)
+        pt = curve.scalar_mult(rng.randrange(1, curve.n), curve.G)
+        runs = 50
+        t = timeit.timeit(lambda: curve.scalar_mult(k, pt), number=runs) / runs
+        print(f"{curve.name:<10} scalar_mult: {t * 1e3:.3f} ms")
+        if curve.glv:
+            glv, curve.glv = curve.glv, None
+            t = timeit.timeit(lambda: curve.scalar_mult(k, pt), number=runs) / runs
+            curve.glv = glv
+            print(f"{curve.name:<10} scalar_mult (不用 GLV): {t * 1e3:.3f} ms")
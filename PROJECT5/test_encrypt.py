@@ -0,0 +1,44 @@
+import pytest
+
+import sm2
+from sm2lib import encrypt, sm3
+from sm2lib.curve import encode_point
+from sm2lib.encrypt import KDFStream, kdf
+from sm2lib.key import SM2Key
+from sm2lib.sm3 import sm3_hash
+
+# 跨过 32 字节的单个分组，以及 KDFStream 改用 sm3_hash_many 的阈值 (python 后端 16 组、simd 后端 512 组)
+LENGTHS = [0, 1, 31, 32, 33, 15 * 32, 16 * 32, 16 * 32 + 1, 512 * 32, 512 * 32 + 1]
+
+def message(n: int) -> bytes:
+    return bytes(i * 7 % 256 for i in range(n))
+
+def reference_kdf(z: bytes, klen: int) -> bytes:
+    return b''.join(sm3_hash(z + i.to_bytes(4, 'big')) for i in range(1, -(-klen // 32) + 1))[:klen]
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_kdf_matches_counter_mode(monkeypatch, batch):
+    monkeypatch.setitem(encrypt._KDF_BATCH_MIN, sm3.get_backend(), 1 if batch else 1 << 32)
+    z = bytes(range(64))
+    for n in LENGTHS:
+        assert kdf(z, n) == reference_kdf(z, n)
+    stream = KDFStream(z)
+    assert b''.join(stream.read(n) for n in (5, 40, 600, 17000)) == reference_kdf(z, 17645)
+
+@pytest.mark.parametrize('n', LENGTHS)
+def test_sm2_and_sm2lib_agree(n):
+    d = SM2Key().private_key
+    new, old = SM2Key(private_key=d), sm2.SM2Key(private_key=d)
+    m = message(n)
+    assert old.decrypt(old.encrypt(m)) == m
+    assert new.decrypt(old.encrypt(m)) == m
+    assert old.decrypt(new.encrypt(m)) == m
+
+@pytest.mark.parametrize('n', [1, 33, 16 * 32 + 1, 512 * 32 + 1])
+def test_gmssl_interop(n):
+    gmssl_sm2 = pytest.importorskip('gmssl.sm2')
+    key = SM2Key()
+    other = gmssl_sm2.CryptSM2(private_key=f'{key.private_key:064x}', public_key=encode_point(key.public_key, 'raw').hex(), mode=1)
+    m = message(n)
+    assert key.decrypt(other.encrypt(m)) == m
+    assert other.decrypt(key.encrypt(m)) == m
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from sig import AccountIndex
+from sm2lib.curve import N, Gx, Gy, multi_scalar_mult, precompute_odd_multiples
+from sm2lib.key import SM2Key
+from sm2lib.sign import _recover_point, recover_batch, recover_public_key
+
+def forge(public_key):
+    """只凭公钥构造 (r, s, recovery_id, e): R = s·G + b·Q，r = b - s，e = r - x_R"""
+    while True:
+        s, b = random.randrange(1, N), random.randrange(1, N)
+        R = multi_scalar_mult([s, b], [precompute_odd_multiples((Gx, Gy)), precompute_odd_multiples(public_key)])
+        r = (b - s) % N
+        if R is None or r == 0 or R[0] >= N: continue
+        return r, s, R[1] & 1, (r - R[0]) % N
+
+def test_recover_roundtrip():
+    key = SM2Key()
+    signature = key.sign_recoverable(b'message')
+    assert recover_public_key(b'message', signature) == key.public_key
+    assert SM2Key.recover(b'message', signature).verify(b'message', signature[:2])
+    with pytest.raises(ValueError):
+        recover_public_key(b'other message', signature)
+
+def test_forged_digest_is_rejected():
+    victim = SM2Key()
+    forged = forge(victim.public_key)
+    assert _recover_point(forged[3], forged[:2], forged[2]) == victim.public_key  # 不校验 e 时伪造成立
+    with pytest.raises(ValueError):
+        SM2Key.recover(b'any message', forged)
+    assert recover_batch([(b'any message', forged)]) == [None]
+    index = AccountIndex.sm2({victim.public_key: 'victim'})
+    assert index.resolve(forged, b'any message') is None
+    signature = victim.sign_recoverable(b'genuine')
+    assert index.resolve_batch([(signature, b'genuine'), (forged, b'genuine')]) == ['victim', None]
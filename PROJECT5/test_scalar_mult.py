@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from sm2lib import curve
+from sm2lib.weierstrass import SM2_CURVE, SECP256K1
+
+def edge_scalars(c):
+    """0、1、n-1、n、n+1 等边界值，以及 GLV 分解中 λ、格基和取整边界附近的值"""
+    n = c.n
+    ks = [0, 1, 2, 3, n - 2, n - 1, n, n + 1, 2 * n - 1, n // 2, n // 2 + 1, 2 ** 128 - 1, 2 ** 128, 2 ** 255, 2 ** 256 - 1]
+    if c.glv:
+        beta, lam, ((a1, b1), (a2, b2)) = c.glv
+        ks += [lam - 1, lam, lam + 1, n - lam, a1, abs(b1), a2, b2, a1 + a2, (a1 * lam) % n]
+        # c1 = round(b2·k / n)、c2 = round(-b1·k / n) 跳变处的 k
+        for m in (1, 2, (n - 1) // b2):
+            k = (m * n - n // 2 + b2 - 1) // b2
+            ks += [k - 1, k, k + 1]
+        for m in (1, 2, (n - 1) // -b1):
+            k = (m * n - n // 2 - b1 - 1) // -b1
+            ks += [k - 1, k, k + 1]
+    rng = random.Random(c.name)
+    return ks + [rng.randrange(1, n) for _ in range(4)]
+
+@pytest.fixture(params=['sm2', 'secp256k1', 'secp256k1-no-glv'])
+def ec(request, monkeypatch):
+    c = SM2_CURVE if request.param == 'sm2' else SECP256K1
+    if request.param.endswith('no-glv'): monkeypatch.setattr(c, 'glv', None)
+    return c
+
+def test_decompose_bounds():
+    n, lam = SECP256K1.n, SECP256K1.glv[1]
+    for k in edge_scalars(SECP256K1):
+        k1, k2 = SECP256K1.decompose(k % n)
+        assert (k1 + k2 * lam - k) % n == 0
+        assert abs(k1) < 2 ** 129 and abs(k2) < 2 ** 129
+
+def test_scalar_mult(ec):
+    pt = ec.scalar_mult_double_and_add(0xC0FFEE, ec.G)
+    for k in edge_scalars(ec):
+        assert ec.scalar_mult(k, pt) == ec.scalar_mult_double_and_add(k, pt)
+        assert ec.scalar_mult_base(k) == ec.scalar_mult_double_and_add(k, ec.G)
+
+def test_multi_scalar_mult(ec):
+    pt = ec.scalar_mult_double_and_add(0xC0FFEE, ec.G)
+    ks = edge_scalars(ec)
+    for k1, k2 in zip(ks, ks[::-1]):
+        expected = ec.point_add(ec.scalar_mult_double_and_add(k1, ec.G), ec.scalar_mult_double_and_add(k2, pt))
+        assert ec.multi_scalar_mult([k1, k2], [ec.G, pt]) == expected
+    # 同一点出现两次、两项互相抵消
+    assert ec.multi_scalar_mult([1, ec.n - 1], [pt, pt]) is None
+    assert ec.multi_scalar_mult([3, 5], [pt, pt]) == ec.scalar_mult_double_and_add(8, pt)
+
+@pytest.mark.parametrize('use_table', [False, True])
+def test_sm2_module_functions(monkeypatch, use_table):
+    """curve.py 的模块级函数: 预热前的 w-NAF 路径与固定基表路径"""
+    monkeypatch.setattr(curve, '_base_table', curve.build_base_table() if use_table else None)
+    monkeypatch.setattr(curve, '_base_uses', 0)
+    monkeypatch.delenv('SM2_G_TABLE', raising=False)
+    pt = curve.scalar_mult_double_and_add(0xC0FFEE, (curve.Gx, curve.Gy))
+    table = curve.precompute_odd_multiples(pt)
+    for k in edge_scalars(SM2_CURVE):
+        assert curve.scalar_mult(k, pt) == curve.scalar_mult_double_and_add(k, pt)
+        assert curve.scalar_mult_base(k) == curve.scalar_mult_double_and_add(k, (curve.Gx, curve.Gy))
+        assert curve.multi_scalar_mult([k, k + 1], [curve.base_odd_multiples(), table]) == \
+            curve.point_add(curve.scalar_mult_double_and_add(k, (curve.Gx, curve.Gy)), curve.scalar_mult_double_and_add(k + 1, pt))
@@ -1,26 +1,126 @@
+import os
 import random
+import sys
+from functools import partial
 from hashlib import sha256
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Union
 from phe import paillier
+from phe.util import powmod  # 安装了 gmpy2 时由 GMP 计算模幂，否则退回内置 pow
 
 def H(val: str, p: int) -> int:
 
     h = sha256(val.encode()).digest()
     return int.from_bytes(h, 'big') % p
 
+# -- 盲化所用的群 --
+# 协议只需要: 把标识符哈希到群元素、取随机指数、做幂运算 (EC 上为标量乘法)、元素可比较可哈希，以及线上编码。
+# ModPGroup 是原来的 pow(H(v), k, p)；ECGroup 使用 SM2 曲线上的素数阶群 (余因子为 1)，
+# 复用 PROJECT5/sm2lib 的 w-NAF 标量乘法，元素以 33 字节压缩点传输。
+class ModPGroup:
+    """Z_p^* 上的模幂 (原实现)，元素为 int"""
+    def __init__(self, p: int):
+        self.p = p
+        self.element_size = (p.bit_length() + 7) // 8
+
+    def hash_to_group(self, val: str) -> int:
+        return H(val, self.p)
+
+    def random_exponent(self) -> int:
+        return random.randint(2, self.p - 2)
+
+    def exp(self, element: int, k: int) -> int:
+        return powmod(element, k, self.p)
+
+    def encode(self, element: int) -> bytes:
+        return element.to_bytes(self.element_size, 'big')
+
+    def decode(self, data: bytes) -> int:
+        return int.from_bytes(data, 'big')
+
+class ECGroup:
+    """SM2 曲线上的素数阶群，元素为仿射点 (x, y)"""
+    element_size = 33
+
+    def __reduce__(self):
+        return ECGroup, ()  # 模块对象不能 pickle，进程池 worker 中重新导入
+
+    def __init__(self):
+        project5 = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'PROJECT5')
+        if project5 not in sys.path: sys.path.append(project5)
+        from sm2lib import curve  # 只在选用 EC 时导入
+        self.curve = curve
+        self.order = curve.N
+
+    def hash_to_group(self, val: str) -> Tuple[int, int]:
+        """try-and-increment: x = SHA256(val || ctr) mod p，直到 x^3 + ax + b 为平方剩余 (平均两次)，取 y 为偶数的根"""
+        data = val.encode()
+        for ctr in range(256):
+            x = int.from_bytes(sha256(data + bytes([ctr])).digest(), 'big') % self.curve.P
+            try:
+                return self.curve.decode_point(b'\x02' + x.to_bytes(32, 'big'))
+            except ValueError:
+                continue
+        raise ValueError("hash_to_group failed.")
+
+    def random_exponent(self) -> int:
+        return random.randrange(1, self.order)
+
+    def exp(self, element: Tuple[int, int], k: int) -> Tuple[int, int]:
+        return self.curve.scalar_mult(k, element)
+
+    def encode(self, element: Tuple[int, int]) -> bytes:
+        return self.curve.encode_point(element, 'compressed')
+
+    def decode(self, data: bytes) -> Tuple[int, int]:
+        return self.curve.decode_point(data)
+
+Group = Union[ModPGroup, ECGroup]
+DEFAULT_P = 115792089237316195423570985008687907853269984665640564039457584007913129639747
+
+def make_group(group: Union[int, str, Group]) -> Group:
+    """int 视为模数 p (兼容原来的接口)，'ec' / 'modp' 为内置的群"""
+    if isinstance(group, int): return ModPGroup(group)
+    if group == 'ec': return ECGroup()
+    if group == 'modp': return ModPGroup(DEFAULT_P)
+    return group
+
+# -- 分块并行 --
+# workers > 1 时把输入切成 chunk_size 大小的块，在进程池中做盲化、二次盲化与 Paillier 加密，
+# 结果按块的原顺序拼接，之后的打乱与单进程时完全相同。
+def _hash_blind_chunk(group: Group, k: int, identifiers: List[str]) -> List[Any]:
+    return [group.exp(group.hash_to_group(v), k) for v in identifiers]
+
+def _blind_chunk(group: Group, k: int, elements: List[Any]) -> List[Any]:
+    return [group.exp(x, k) for x in elements]
+
+def _blind_encrypt_chunk(group: Group, k: int, public_key: paillier.PaillierPublicKey,
+                         items: List[Tuple[str, int]]) -> List[Tuple[Any, paillier.EncryptedNumber]]:
+    return [(group.exp(group.hash_to_group(w), k), public_key.encrypt(t)) for w, t in items]
+
+def run_chunked(fn, items, workers: int = 1, chunk_size: int = 1024) -> List[Any]:
+    """对 items 分块执行 fn (接收一个块、返回列表)，按原顺序拼接结果"""
+    items = list(items)
+    if workers <= 1 or len(items) <= chunk_size: return fn(items)
+    from concurrent.futures import ProcessPoolExecutor
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [x for chunk_result in pool.map(fn, chunks) for x in chunk_result]
+
 class Party1:
 
-    def __init__(self, identifiers: List[str], p: int):
+    def __init__(self, identifiers: List[str], group: Union[int, str, Group], workers: int = 1, chunk_size: int = 1024):
         self.V = set(identifiers)
-        self.p = p
-        self.k1 = random.randint(2, self.p - 2)
+        self.workers, self.chunk_size = workers, chunk_size
+        self.group = make_group(group)
+        self.p = getattr(self.group, 'p', None)
+        self.k1 = self.group.random_exponent()
         self.paillier_pk = None
 
     def set_paillier_public_key(self, public_key: paillier.PaillierPublicKey):
         self.paillier_pk = public_key
 
-    def round1_output(self) -> List[int]:
-        blinded_data = [pow(H(v, self.p), self.k1, self.p) for v in self.V]
+    def round1_output(self) -> List[Any]:
+        blinded_data = run_chunked(partial(_hash_blind_chunk, self.group, self.k1), self.V, self.workers, self.chunk_size)
         random.shuffle(blinded_data)
         return blinded_data
 
@@ -29,7 +129,8 @@ class Party1:
         ciphertext_set = p2_response['ciphertext_set']
 
         #计算H(w_j)^{k1*k2} 用于匹配
-        H_wj_k1k2 = {pow(h, self.k1, self.p): ct for h, ct in ciphertext_set}
+        H_wj_k1k2 = dict(zip(run_chunked(partial(_blind_chunk, self.group, self.k1), [h for h, _ in ciphertext_set],
+                                         self.workers, self.chunk_size), (ct for _, ct in ciphertext_set)))
 
         #找出Z中与H_wj_k1k2匹配的值
         intersection_ciphertexts = [
@@ -49,22 +150,22 @@ class Party1:
 
 class Party2:
 
-    def __init__(self, data: List[Tuple[str, int]], p: int):
+    def __init__(self, data: List[Tuple[str, int]], group: Union[int, str, Group], workers: int = 1,
+                 chunk_size: int = 1024):
         self.W = dict(data)
-        self.p = p
-        self.k2 = random.randint(2, self.p - 2)
+        self.workers, self.chunk_size = workers, chunk_size
+        self.group = make_group(group)
+        self.p = getattr(self.group, 'p', None)
+        self.k2 = self.group.random_exponent()
         self.paillier_pk, self.paillier_sk = paillier.generate_paillier_keypair(n_length=1024)
 
-    def round2_output(self, p1_data: List[int]) -> Dict[str, Any]:
+    def round2_output(self, p1_data: List[Any]) -> Dict[str, Any]:
         #Z = { (H(v)^k1)^k2 }
-        Z = {pow(h_v_k1, self.k2, self.p) for h_v_k1 in p1_data}
+        Z = set(run_chunked(partial(_blind_chunk, self.group, self.k2), p1_data, self.workers, self.chunk_size))
 
         # H(w)^k2 和 AEnc(t)
-        ciphertext_set = []
-        for w, t in self.W.items():
-            h_w_k2 = pow(H(w, self.p), self.k2, self.p)
-            encrypted_t = self.paillier_pk.encrypt(t)
-            ciphertext_set.append((h_w_k2, encrypted_t))
+        ciphertext_set = run_chunked(partial(_blind_encrypt_chunk, self.group, self.k2, self.paillier_pk),
+                                     self.W.items(), self.workers, self.chunk_size)
         
         random.shuffle(ciphertext_set)
         
@@ -79,9 +180,9 @@ class Party2:
 
 
 
-def run_protocol():
-    # 公共参数p
-    p = 115792089237316195423570985008687907853269984665640564039457584007913129639747
+def run_protocol(group: str = 'modp', workers: int = 1):
+    # 公共参数: 'modp' 为原来的模 p 群 (默认)，'ec' 为 SM2 曲线群
+    group = make_group(group)
 
     # P1：待检测账号
     p1_data = ["2003", "202200460117", "123456", "sdu"]
@@ -93,13 +194,14 @@ def run_protocol():
     print(f"P1 的输入: {p1_data}")
     print(f"P2 的输入: {p2_data}")
 
-    p1 = Party1(p1_data, p)
-    p2 = Party2(p2_data, p)
+    p1 = Party1(p1_data, group, workers)
+    p2 = Party2(p2_data, group, workers)
     
     # P2 将其 Paillier 公钥发送给 P1
     p1.set_paillier_public_key(p2.paillier_pk)
 
     p1_output_r1 = p1.round1_output()
+    print(f"群: {type(group).__name__}，每个盲化元素 {group.element_size} 字节")
     p2_output_r2 = p2.round2_output(p1_output_r1)
     p1_output_r3 = p1.round3_output(p2_output_r2)
     final_sum = p2.final_decryption(p1_output_r3)
@@ -118,4 +220,5 @@ def run_protocol():
     print("结果验证成功")
 
 if __name__ == "__main__":
-    run_protocol()
+    # python Google_Password_Checkup.py [modp|ec] [进程数]
+    run_protocol(sys.argv[1] if len(sys.argv) > 1 else 'modp', int(sys.argv[2]) if len(sys.argv) > 2 else 1)